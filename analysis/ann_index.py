@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+import similarity
+from citation_graph import save_array
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+BACKENDS = ('ivf', 'hnsw')
+
+
+def fingerprint(vectors, params=None):
+    digest = hashlib.sha1(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+    digest.update(json.dumps(params or {}, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def assign(X, centroids, block_size=4096):
+    labels = np.empty(len(X), dtype=np.int64)
+    for start in range(0, len(X), block_size):
+        labels[start:start + block_size] = np.argmax(X[start:start + block_size] @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(X, n_clusters, n_iter=20, seed=42):
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(len(X), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = assign(X, centroids)
+        members = sparse.csr_matrix((np.ones(len(X), dtype=np.float32), (labels, np.arange(len(X)))),
+                                    shape=(n_clusters, len(X)))
+        sums = np.asarray(members @ X)
+        counts = np.bincount(labels, minlength=n_clusters)
+        empty = counts == 0
+        sums[empty] = X[rng.choice(len(X), empty.sum(), replace=False)]
+        centroids = similarity.normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    backend = 'ivf'
+
+    def __init__(self, vectors, centroids, list_offsets, list_ids, n_probe=8):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.n_probe = n_probe
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, n_probe=8, n_iter=20, seed=42):
+        X = similarity.normalize(embeddings)
+        n_lists = n_lists or max(1, int(np.sqrt(len(X))))
+        n_lists = min(n_lists, len(X))
+        centroids = spherical_kmeans(X, n_lists, n_iter, seed)
+        labels = assign(X, centroids)
+        list_ids = np.argsort(labels, kind='stable')
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+        return cls(X, centroids, list_offsets, list_ids, min(n_probe, n_lists))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries, k=10, n_probe=None):
+        Q = similarity.normalize(np.atleast_2d(queries))
+        n_lists = len(self.centroids)
+        n_probe = min(n_probe or self.n_probe, n_lists)
+        probes = np.argpartition(-(Q @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe].ravel()
+        query_ids = np.repeat(np.arange(len(Q)), n_probe)
+        order = np.argsort(probes, kind='stable')
+        probes, query_ids = probes[order], query_ids[order]
+        bounds = np.searchsorted(probes, np.arange(n_lists + 1))
+        ids = np.full((len(Q), k), -1, dtype=np.int64)
+        scores = np.full((len(Q), k), -np.inf, dtype=np.float32)
+        for l in np.flatnonzero(np.diff(bounds)):
+            members = self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]]
+            if not len(members):
+                continue
+            queries_l = query_ids[bounds[l]:bounds[l + 1]]
+            candidate_scores = np.hstack([scores[queries_l], Q[queries_l] @ self.vectors[members].T])
+            candidate_ids = np.hstack([ids[queries_l], np.broadcast_to(members, (len(queries_l), len(members)))])
+            top = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+            scores[queries_l] = np.take_along_axis(candidate_scores, top, axis=1)
+            ids[queries_l] = np.take_along_axis(candidate_ids, top, axis=1)
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def save(self, path, source=None):
+        os.makedirs(path, exist_ok=True)
+        for name in ('vectors', 'centroids', 'list_offsets', 'list_ids'):
+            save_array(os.path.join(path, f'{name}.npy'), np.asarray(getattr(self, name)))
+        write_info(path, {'backend': self.backend, 'n_probe': self.n_probe, 'fingerprint': source})
+
+    @classmethod
+    def load(cls, path, info):
+        arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+                  for name in ('vectors', 'centroids', 'list_offsets', 'list_ids')]
+        return cls(*arrays, n_probe=info['n_probe'])
+
+
+class HNSWIndex:
+    backend = 'hnsw'
+
+    def __init__(self, index, size):
+        self.index = index
+        self.size = size
+
+    @classmethod
+    def build(cls, embeddings, m=16, ef_construction=200, ef=64):
+        if hnswlib is None:
+            raise ImportError("The hnsw backend needs the hnswlib package (pip install hnswlib)")
+        X = similarity.normalize(embeddings)
+        index = hnswlib.Index(space='cosine', dim=X.shape[1])
+        index.init_index(max_elements=len(X), M=m, ef_construction=ef_construction)
+        index.add_items(X, np.arange(len(X)))
+        index.set_ef(ef)
+        return cls(index, len(X))
+
+    def __len__(self):
+        return self.size
+
+    def search(self, queries, k=10):
+        self.index.set_ef(max(self.index.ef, k))
+        ids, distances = self.index.knn_query(similarity.normalize(np.atleast_2d(queries)), k=min(k, self.size))
+        return ids.astype(np.int64), (1 - distances).astype(np.float32)
+
+    def save(self, path, source=None):
+        os.makedirs(path, exist_ok=True)
+        self.index.save_index(os.path.join(path, 'hnsw.bin'))
+        write_info(path, {'backend': self.backend, 'size': self.size, 'dim': self.index.dim, 'fingerprint': source})
+
+    @classmethod
+    def load(cls, path, info):
+        if hnswlib is None:
+            raise ImportError("The hnsw backend needs the hnswlib package (pip install hnswlib)")
+        index = hnswlib.Index(space='cosine', dim=info['dim'])
+        index.load_index(os.path.join(path, 'hnsw.bin'), max_elements=info['size'])
+        return cls(index, info['size'])
+
+
+def write_info(path, info):
+    file = os.path.join(path, 'index.json')
+    with open(file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    os.replace(file + '.tmp', file)
+
+
+def read_info(path):
+    file = os.path.join(path, 'index.json')
+    if not os.path.exists(file):
+        return None
+    with open(file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_index(path):
+    info = read_info(path)
+    index_class = HNSWIndex if info['backend'] == 'hnsw' else IVFIndex
+    return index_class.load(path, info)
+
+
+def load_or_build(path, embeddings, backend='ivf', **kwargs):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+    # Callers may pass raw or normalized vectors; the index and its fingerprint always
+    # come from the normalized ones, so every caller shares the same persisted index
+    X = similarity.normalize(embeddings)
+    source = fingerprint(X, kwargs)
+    info = read_info(path)
+    if info and info['backend'] == backend and info['fingerprint'] == source:
+        return load_index(path)
+    index_class = HNSWIndex if backend == 'hnsw' else IVFIndex
+    index = index_class.build(X, **kwargs)
+    index.save(path, source)
+    return index
+
+
+def knn_graph(index, k=10, block_size=8192):
+    n = len(index)
+    rows, cols, weights = [], [], []
+    vectors = index.vectors if hasattr(index, 'vectors') else None
+    for start in range(0, n, block_size):
+        queries = vectors[start:start + block_size] if vectors is not None else index.index.get_items(
+            range(start, min(start + block_size, n)))
+        ids, scores = index.search(np.asarray(queries), k + 1)
+        query_ids = np.repeat(np.arange(start, start + len(ids))[:, None], ids.shape[1], axis=1)
+        keep = (ids >= 0) & (ids != query_ids)
+        keep &= np.cumsum(keep, axis=1) <= k
+        query_ids, ids, scores, keep = query_ids.ravel(), ids.ravel(), scores.ravel(), keep.ravel()
+        rows.append(query_ids[keep])
+        cols.append(ids[keep])
+        weights.append(scores[keep])
+    W = sparse.csr_matrix((np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+    W = W.maximum(W.T)
+    return sparse.triu(W, k=1).tocoo()
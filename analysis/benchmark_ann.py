@@ -0,0 +1,52 @@
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+import ann_index
+
+
+# Compare top-k neighbours from the ANN index with the brute-force cosine_similarity
+# path: recall@k and query time for several n_probe values.
+
+input_path = sys.argv[1] if len(sys.argv) > 1 else 'embeddings/embeddings.npy'
+k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+backend = sys.argv[3] if len(sys.argv) > 3 else 'ivf'
+embeddings = np.load(input_path)
+rng = np.random.default_rng(42)
+queries = embeddings[rng.choice(len(embeddings), min(1000, len(embeddings)), replace=False)]
+
+start = time.perf_counter()
+index = ann_index.load_or_build('embeddings/ann_index', embeddings, backend=backend)
+build_time = time.perf_counter() - start
+
+start = time.perf_counter()
+similarities = cosine_similarity(queries, embeddings)
+exact = np.argsort(-similarities, axis=1)[:, :k]
+exact_time = time.perf_counter() - start
+kth_similarity = np.take_along_axis(similarities, exact[:, -1:], axis=1)
+
+
+# Duplicate abstracts give tied similarities, so a neighbour counts as a hit when it
+# is at least as similar as the exact k-th neighbour.
+def recall(ids):
+    found = np.take_along_axis(similarities, np.maximum(ids, 0), axis=1)
+    return np.mean((ids >= 0) & (found >= kth_similarity - 1e-6))
+
+
+print(f'{len(embeddings)} embeddings, {len(queries)} queries, k={k}, backend={backend}')
+print(f'index load/build: {build_time * 1000:8.1f} ms')
+print(f'brute force:      {exact_time / len(queries) * 1000:8.3f} ms/query')
+if backend == 'ivf':
+    print(f'{len(index.centroids)} inverted lists')
+    for n_probe in (1, 2, 4, 8, 16, 32):
+        start = time.perf_counter()
+        ids, _ = index.search(queries, k, n_probe)
+        elapsed = time.perf_counter() - start
+        print(f'n_probe={n_probe:<3} {elapsed / len(queries) * 1000:8.3f} ms/query  recall@{k}={recall(ids):.3f}')
+else:
+    start = time.perf_counter()
+    ids, _ = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    print(f'hnsw        {elapsed / len(queries) * 1000:8.3f} ms/query  recall@{k}={recall(ids):.3f}')
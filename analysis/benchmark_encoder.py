@@ -0,0 +1,57 @@
+import sys
+import time
+
+import numpy as np
+
+import corpus_cache
+import similarity
+from encoder import Encoder, load_model
+
+
+# Compare the CPU encoding paths with the plain float32 `model.encode(abstracts)` call:
+# documents per second and cosine drift of the resulting vectors.
+
+path = sys.argv[1] if len(sys.argv) > 1 else '../extraction/biblio_output/'
+n_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+model_name = 'intfloat/multilingual-e5-large'
+
+patents = corpus_cache.load_patents(path)
+abstracts = list({patent['patent_number']: patent.get('abstract', 'Unavailable information')
+                  for patent in patents}.values())[:n_docs]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, np.asarray(result, dtype=np.float32)
+
+
+def drift(vectors, reference):
+    cosine = np.sum(similarity.normalize(vectors) * similarity.normalize(reference), axis=1)
+    return 1 - cosine.mean(), 1 - cosine.min()
+
+
+def report(label, elapsed, vectors):
+    mean_drift, max_drift = drift(vectors, baseline)
+    print(f'{label:<28} {len(abstracts) / elapsed:8.1f} docs/s  drift mean {mean_drift:.2e} max {max_drift:.2e}')
+
+
+model = load_model(model_name)
+baseline_time, baseline = timed(lambda: model.encode(abstracts))
+del model
+print(f'{len(abstracts)} abstracts, {model_name}')
+report('float32 model.encode', baseline_time, baseline)
+report('float16 storage', baseline_time, baseline.astype(np.float16))
+
+configurations = [('torch', 1), ('torch', workers), ('int8', 1), ('int8', workers), ('onnx', 1), ('onnx-int8', workers)]
+for backend, n_workers in configurations:
+    try:
+        with Encoder(model_name, backend, n_workers) as encoder:
+            encoder.start()
+            encoder.encode(abstracts[:8])
+            elapsed, vectors = timed(lambda: encoder.encode(abstracts))
+    except ImportError as e:
+        print(f'{backend:<28} skipped: {e}')
+        continue
+    report(f'{backend}, sorted, {n_workers} worker(s)', elapsed, vectors)
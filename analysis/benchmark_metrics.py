@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import time
+
+import networkx as nx
+import numpy as np
+
+import corpus_cache
+import graph_metrics
+import utils
+from citation_graph import CitationGraph
+
+
+# Compare a full rebuild of the citation metrics with extending the saved graph by the
+# last `delta` patents of the corpus and warm-starting PageRank from the saved metrics,
+# both for the metrics alone and for all of section 1 of citation_analysis.py, which
+# also writes total_patents_df.xlsx.
+
+path = sys.argv[1] if len(sys.argv) > 1 else '../extraction/biblio_output/'
+delta = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+patents = corpus_cache.load_patents(path)
+numbers = list(dict.fromkeys(patent['patent_number'] for patent in patents))
+new_numbers = set(numbers[-delta:])
+base_patents = [patent for patent in patents if patent['patent_number'] not in new_numbers]
+new_patents = [patent for patent in patents if patent['patent_number'] in new_numbers]
+
+base_graph = CitationGraph.from_patents(base_patents)
+base_metrics = graph_metrics.compute_metrics(base_graph)
+
+
+def timed(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def networkx_rebuild():
+    G = nx.DiGraph()
+    for patent in patents:
+        for cite in patent['citations']:
+            G.add_edge(patent['patent_number'], cite)
+    return dict(G.in_degree()), dict(G.out_degree()), nx.pagerank(G)
+
+
+def full_rebuild():
+    return graph_metrics.compute_metrics(CitationGraph.from_patents(patents))
+
+
+def incremental_update():
+    return graph_metrics.compute_metrics(base_graph.extend(new_patents), start=base_metrics['pagerank'])
+
+
+def section_rebuild():
+    G = CitationGraph.from_patents(patents)
+    utils.patents_dataframe(G, patents, graph_metrics.compute_metrics(G)).to_excel(excel_file)
+
+
+def section_update():
+    G = base_graph.extend(new_patents)
+    metrics_df = graph_metrics.compute_metrics(G, start=base_metrics['pagerank'])
+    G.built_from(base_patents)
+    utils.patents_dataframe(G, patents, metrics_df).to_excel(excel_file)
+
+
+networkx_time, _ = timed(networkx_rebuild)
+full_time, full = timed(full_rebuild)
+incremental_time, incremental = timed(incremental_update)
+incremental = incremental.loc[full.index]
+with tempfile.TemporaryDirectory() as directory:
+    excel_file = os.path.join(directory, 'total_patents_df.xlsx')
+    section_rebuild_time, _ = timed(section_rebuild, repeat=3)
+    section_update_time, _ = timed(section_update, repeat=3)
+
+print(f'{len(base_patents)} documents + {len(new_patents)} new, {len(full)} nodes')
+print(f'networkx rebuild:    {networkx_time * 1000:8.1f} ms')
+print(f'sparse rebuild:      {full_time * 1000:8.1f} ms')
+print(f'extend + warm start: {incremental_time * 1000:8.1f} ms ({full_time / incremental_time:.2f}x vs sparse rebuild, '
+      f'{networkx_time / incremental_time:.1f}x vs networkx)')
+print(f'section 1 with total_patents_df.xlsx: {section_rebuild_time * 1000:.0f} ms rebuilt, '
+      f'{section_update_time * 1000:.0f} ms extended ({section_rebuild_time / section_update_time:.2f}x)')
+for column in ('input_degree', 'output_degree', 'pagerank', 'hub', 'authority', 'core_number'):
+    print(f'max |full - incremental| {column}: {np.abs(full[column] - incremental[column]).max():.2e}')
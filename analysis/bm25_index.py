@@ -0,0 +1,292 @@
+import argparse
+import hashlib
+import os
+import pickle
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.append('..')
+
+import text_pipeline
+from extraction.records import UNAVAILABLE
+
+
+INDEX_VERSION = 1
+INDEX_PATH = 'index/bm25.pkl'
+FIELDS = ('title', 'abstract', 'applicant')
+FIELD_WEIGHTS = {'title': 2.0, 'abstract': 1.0, 'applicant': 1.0}
+QUERY_PATTERN = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+
+
+def patent_fields(patent):
+    fields = {
+        'title': patent['invention_title'],
+        'abstract': patent['abstract'],
+        'applicant': ' '.join(patent['applicant_names']),
+    }
+    return {field: '' if text == UNAVAILABLE else text for field, text in fields.items()}
+
+
+def latest_fields(patents):
+    # A patent listed under several topics is indexed once, with its last version, so
+    # repeated updates over the same corpus are idempotent
+    return {patent['patent_number']: patent_fields(patent) for patent in patents}
+
+
+def fields_fingerprint(fields):
+    return hashlib.sha1('\0'.join(fields[field] for field in FIELDS).encode('utf-8')).hexdigest()
+
+
+def parse_query(query):
+    clauses = []
+    for field, phrase, word in QUERY_PATTERN.findall(query):
+        if field and field not in FIELDS:
+            word, field = f'{field}:{word or phrase}', ''
+        clauses.append((field or None, phrase if phrase else word, bool(phrase)))
+    return clauses
+
+
+class BM25Index:
+    def __init__(self, k1=1.2, b=0.75, analyzer=None):
+        self.k1 = k1
+        self.b = b
+        self.analyzer = analyzer
+        self.doc_ids = []
+        self.titles = []
+        self.fingerprints = []
+        self.alive = []
+        self.row = {}
+        self.lengths = {field: [] for field in FIELDS}
+        self.postings = {field: {} for field in FIELDS}
+        self._cache = {}
+
+    def analyze(self, text):
+        return self.analyzer(text or '').split() if self.analyzer else text_pipeline.clean_tokens(text or '')
+
+    def __len__(self):
+        return len(self.row)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        state['analyzer'] = None
+        return state
+
+    def add(self, patent_number, fields, tokens=None):
+        fingerprint = fields_fingerprint(fields)
+        previous = self.row.get(patent_number)
+        if previous is not None:
+            if self.fingerprints[previous] == fingerprint:
+                return False
+            self.alive[previous] = False
+        doc = len(self.doc_ids)
+        self.doc_ids.append(patent_number)
+        self.titles.append(' '.join(fields['title'].split()) or UNAVAILABLE)
+        self.fingerprints.append(fingerprint)
+        self.alive.append(True)
+        self.row[patent_number] = doc
+        for field in FIELDS:
+            field_tokens = tokens[field] if tokens else self.analyze(fields[field])
+            self.lengths[field].append(len(field_tokens))
+            positions = {}
+            for position, token in enumerate(field_tokens):
+                positions.setdefault(token, []).append(position)
+            postings = self.postings[field]
+            for token, token_positions in positions.items():
+                entry = postings.get(token)
+                if entry is None:
+                    entry = postings[token] = ([], [])
+                entry[0].append(doc)
+                entry[1].append(tuple(token_positions))
+        self._cache = {}
+        return True
+
+    def update(self, patents, workers=1):
+        pending = {}
+        for patent_number, fields in latest_fields(patents).items():
+            previous = self.row.get(patent_number)
+            if previous is None or self.fingerprints[previous] != fields_fingerprint(fields):
+                pending[patent_number] = fields
+        tokens = None
+        if pending and self.analyzer is None:
+            # New and changed documents are cleaned in one batch through the shared token cache
+            cache = text_pipeline.TokenCache()
+            tokens = iter(cache.clean([fields[field] for fields in pending.values() for field in FIELDS], workers))
+            cache.save()
+        changed = 0
+        for patent_number, fields in pending.items():
+            changed += self.add(patent_number, fields, {field: next(tokens) for field in FIELDS} if tokens else None)
+        if len(self.doc_ids) > 1.25 * len(self.row):
+            self.compact()
+        return changed
+
+    def compact(self):
+        # Drop the rows of replaced documents and renumber the postings
+        alive = np.asarray(self.alive, dtype=bool)
+        new_row = np.cumsum(alive) - 1
+        keep = np.flatnonzero(alive).tolist()
+        self.doc_ids = [self.doc_ids[doc] for doc in keep]
+        self.titles = [self.titles[doc] for doc in keep]
+        self.fingerprints = [self.fingerprints[doc] for doc in keep]
+        self.alive = [True] * len(keep)
+        self.row = {patent_number: doc for doc, patent_number in enumerate(self.doc_ids)}
+        for field in FIELDS:
+            self.lengths[field] = [self.lengths[field][doc] for doc in keep]
+            postings = {}
+            for token, (docs, positions) in self.postings[field].items():
+                entries = [(int(new_row[doc]), doc_positions)
+                           for doc, doc_positions in zip(docs, positions) if alive[doc]]
+                if entries:
+                    postings[token] = ([doc for doc, _ in entries], [doc_positions for _, doc_positions in entries])
+            self.postings[field] = postings
+        self._cache = {}
+
+    def cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def alive_array(self):
+        return self.cached('alive', lambda: np.asarray(self.alive, dtype=bool))
+
+    def length_array(self, field):
+        return self.cached(('lengths', field), lambda: np.asarray(self.lengths[field], dtype=np.float32))
+
+    def average_length(self, field):
+        def build():
+            lengths = self.length_array(field)[self.alive_array()]
+            return max(float(lengths.mean()), 1.0) if len(lengths) else 1.0
+        return self.cached(('average', field), build)
+
+    def posting_docs(self, field, token):
+        return self.cached(('docs', field, token), lambda: np.asarray(self.postings[field][token][0], dtype=np.int64))
+
+    def term_arrays(self, field, token):
+        def build():
+            entry = self.postings[field].get(token)
+            if entry is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            docs = np.asarray(entry[0], dtype=np.int64)
+            tfs = np.fromiter((len(positions) for positions in entry[1]), dtype=np.float32, count=len(docs))
+            keep = self.alive_array()[docs]
+            return docs[keep], tfs[keep]
+        return self.cached(('term', field, token), build)
+
+    def bm25(self, field, docs, tfs):
+        n_docs = len(self.row)
+        idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * self.length_array(field)[docs] / self.average_length(field))
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+    def phrase_arrays(self, field, tokens):
+        return self.cached(('phrase', field, tuple(tokens)), lambda: self.match_phrase(field, tokens))
+
+    def match_phrase(self, field, tokens):
+        docs, _ = self.term_arrays(field, tokens[0])
+        for token in tokens[1:]:
+            docs = np.intersect1d(docs, self.term_arrays(field, token)[0], assume_unique=True)
+        matches, counts = [], []
+        if not len(docs):
+            return np.asarray(matches, dtype=np.int64), np.asarray(counts, dtype=np.float32)
+        slots = [np.searchsorted(self.posting_docs(field, token), docs).tolist() for token in tokens]
+        field_positions = [self.postings[field][token][1] for token in tokens]
+        for i, doc in enumerate(docs.tolist()):
+            positions = [token_positions[slot[i]] for token_positions, slot in zip(field_positions, slots)]
+            count = len(set(positions[0]).intersection(*(
+                {position - offset for position in token_positions} for offset, token_positions in
+                enumerate(positions[1:], 1))))
+            if count:
+                matches.append(doc)
+                counts.append(count)
+        return np.asarray(matches, dtype=np.int64), np.asarray(counts, dtype=np.float32)
+
+    def clause_scores(self, field, text, phrase):
+        tokens = self.analyze(text)
+        if not tokens:
+            return None
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for current_field in ([field] if field else FIELDS):
+            weight = FIELD_WEIGHTS[current_field]
+            if phrase and len(tokens) > 1:
+                docs, tfs = self.phrase_arrays(current_field, tokens)
+                scores[docs] += weight * self.bm25(current_field, docs, tfs)
+            else:
+                for token in tokens:
+                    docs, tfs = self.term_arrays(current_field, token)
+                    scores[docs] += weight * self.bm25(current_field, docs, tfs)
+        return scores
+
+    def search(self, query, k=10, operator='and'):
+        total = np.zeros(len(self.doc_ids), dtype=np.float32)
+        matched = np.full(len(self.doc_ids), operator == 'and')
+        clauses = 0
+        for field, text, phrase in parse_query(query):
+            scores = self.clause_scores(field, text, phrase)
+            if scores is None:
+                continue
+            clauses += 1
+            total += scores
+            matched = matched & (scores > 0) if operator == 'and' else matched | (scores > 0)
+        candidates = np.flatnonzero(matched) if clauses else np.empty(0, dtype=np.int64)
+        k = min(k, len(candidates))
+        if not k:
+            return []
+        top = candidates[np.argpartition(-total[candidates], k - 1)[:k]]
+        top = top[np.argsort(-total[top], kind='stable')]
+        return [(self.doc_ids[doc], float(total[doc]), self.titles[doc]) for doc in top.tolist()]
+
+    def count(self, query, operator='and'):
+        return len(self.search(query, len(self.doc_ids), operator))
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'index': self}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return data['index'] if data.get('version') == INDEX_VERSION else None
+
+
+def load_or_build(corpus_path='../extraction/biblio_output/', path=INDEX_PATH, rebuild=False, workers=1):
+    import corpus_cache
+    index = None if rebuild else BM25Index.load(path)
+    index = index or BM25Index()
+    changed = index.update(corpus_cache.load_patents(corpus_path), workers)
+    if changed:
+        index.save(path)
+        print(f'BM25 index updated: {changed} documents indexed, {len(index)} in total')
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keyword search over titles, abstracts and applicants')
+    parser.add_argument('query', help='words, "quoted phrases", field:word and field:"phrase" '
+                                      '(fields: title, abstract, applicant)')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--or', dest='operator', action='store_const', const='or', default='and',
+                        help='match any clause instead of all of them')
+    parser.add_argument('--corpus', default='../extraction/biblio_output/')
+    parser.add_argument('--index', default=INDEX_PATH)
+    parser.add_argument('--rebuild', action='store_true')
+    parser.add_argument('--workers', type=int, default=1, help='processes used to clean new documents')
+    args = parser.parse_args()
+
+    index = load_or_build(args.corpus, args.index, args.rebuild, args.workers)
+    start = time.perf_counter()
+    results = index.search(args.query, args.k, args.operator)
+    elapsed = time.perf_counter() - start
+    for rank, (patent_number, score, title) in enumerate(results, 1):
+        print(f'{rank:>3}. {score:7.3f}  {patent_number:<16} {title}')
+    print(f'({len(results)} results in {elapsed * 1000:.2f} ms)')
@@ -1,77 +1,49 @@
-import networkx as nx
 from pyvis.network import Network
+from community import community_louvain
 import textwrap
 import json
 import utils
+import corpus_cache
+from citation_graph import CitationGraph
+import graph_metrics
+import citation_networks
 import pandas as pd
 
-path = '../extraction/biblio_output/'
-patents = utils.get_patents_citations(path)
 
 
 # 1. Create a total graph and a DataFrame with all the patents
 # ------------------------------------------------------------
 
-# Load the additional data
+# Load the patents
 path = '../extraction/biblio_output/'
-patents = utils.get_patents_citations(path)
-additional_data_dict = {
-    patent['patent_number']: [
-        patent.get('abstract', 'Unavailable information'),
-        patent.get('year', 'Unavailable information'),
-        patent.get('inventor_names', 'Unavailable information'),
-        patent.get('applicant_names', 'Unavailable information'),
-        patent.get('country', 'Unavailable information'),
-        patent.get('invention_title', 'Unavailable information')
-    ]
-    for patent in patents
-}
-
-# Add the additional data to the patents
-for patent in patents:
-    patent_number = patent['patent_number']
-    additional_data = additional_data_dict[patent_number]
-    patent['abstract'] = additional_data[0]
-    patent['year'] = additional_data[1]
-    patent['inventor_names'] = additional_data[2]
-    patent['applicant_names'] = additional_data[3]
-    patent['country'] = additional_data[4]
-    patent['invention_title'] = additional_data[5]
-
-# Create the graph      
-G = nx.DiGraph()
-for patent in patents:
-    patent_number = patent['patent_number']
-    cites = patent['citations']
-    G.add_node(
-        patent_number,
-        abstract=patent.get('abstract', 'Unavailable information'),
-        year=patent.get('year', 'Unavailable information'),
-        inventor_names=patent.get('inventor_names', 'Unavailable information'),
-        applicant_names=patent.get('applicant_names', 'Unavailable information'),
-        country=patent.get('country', 'Unavailable information'),
-        invention_title=patent.get('invention_title', 'Unavailable information')
-    )
-    for cite in cites:
-        G.add_edge(patent_number, cite)
-nx.write_edgelist(G, "graphs/total_graph.edgelist")
-
-node_data = []
-for node, data in G.nodes(data=True):
-    data['patent_number'] = node
-    data['input_degree'] = G.in_degree(node)
-    data['output_degree'] = G.out_degree(node)
-    data['pagerank'] = nx.pagerank(G)[node]
-    data['abstract'] = data.get('abstract', 'Unavailable information')
-    data['year'] = data.get('year', 'Unavailable information')
-    data['inventor_names'] = data.get('inventor_names', 'Unavailable information')
-    data['applicant_names'] = data.get('applicant_names', 'Unavailable information')
-    data['country'] = data.get('country', 'Unavailable information')
-    node_data.append(data)
-total_patents_df = pd.DataFrame(node_data)
-total_patents_df = total_patents_df.sort_values(by='input_degree', ascending=False)
-# total_patents_df = utils.convert_grafo_to_df(G)
-# total_patents_df = total_patents_df.sort_values(by='input_degree', ascending=False)
+patents = corpus_cache.load_patents(path)
+
+# Create the graph, or extend the saved one with the patents added since the last run. The saved
+# graph is reused while the corpus fingerprint is unchanged, and only extended while every patent
+# it was built from still has the same citations; anything else is a full rebuild
+incremental = True
+corpus = corpus_cache.fingerprint(path)
+previous_metrics = graph_metrics.load_metrics("graphs/total_graph") if incremental else None
+G = None
+if previous_metrics is not None:
+    previous_graph = CitationGraph.load("graphs/total_graph")
+    if graph_metrics.same_corpus("graphs/total_graph", corpus):
+        G, metrics_df = previous_graph, previous_metrics
+        print('Citation graph is up to date')
+    elif previous_graph.built_from(patents):
+        citing_patents = previous_graph.citing_nodes()
+        new_patents = [patent for patent in patents if patent['patent_number'] not in citing_patents]
+        G = previous_graph.extend(new_patents)
+        metrics_df = graph_metrics.compute_metrics(G, start=previous_metrics['pagerank'])
+        print(f'Citation graph updated with {len(new_patents)} new patents')
+if G is None:
+    G = CitationGraph.from_patents(patents)
+    metrics_df = utils.convert_grafo_to_df(G)
+if metrics_df is not previous_metrics:
+    G.save("graphs/total_graph")
+    graph_metrics.save_metrics(metrics_df, "graphs/total_graph", corpus)
+
+total_patents_df = utils.patents_dataframe(G, patents, metrics_df)
 total_patents_df.to_excel('graphs/total_patents_df.xlsx')
 print(f'Total patents shape: {total_patents_df.shape}')
 
@@ -82,38 +54,36 @@ print(f'Total patents shape: {total_patents_df.shape}')
 # -----------------------------------------------------------------------------------
 
 degree_threshold = 0
-filtered_nodes_degree = [node for node in G.nodes() if G.in_degree(node) > degree_threshold]
-G_filtered_degree = G.subgraph(filtered_nodes_degree)
+G_filtered_degree = G.filter_in_degree(degree_threshold)
 filtered_degree_df = utils.convert_grafo_to_df(G_filtered_degree)
 filtered_degree_df = filtered_degree_df.sort_values(by='input_degree', ascending=False)
 filtered_degree_df.to_excel('graphs/filtered_degree_df.xlsx')
-nx.write_edgelist(G_filtered_degree, "graphs/filtered_degree_graph.edgelist")
+G_filtered_degree.save("graphs/filtered_degree_graph")
 print(f'Filtered degree patents shape: {filtered_degree_df.shape}')
 
 
 # 3. Create a filtered graph and a DataFrame with the patents with a input degree > 0
 # -----------------------------------------------------------------------------------
 
-non_isolated_patents = [nodo for nodo in G_filtered_degree.nodes if G_filtered_degree.degree(nodo) > 0]
-G_no_isolated = G_filtered_degree.subgraph(non_isolated_patents)
+G_no_isolated = G_filtered_degree.non_isolated()
 non_isolated_patents_df = utils.convert_grafo_to_df(G_no_isolated)
 non_isolated_patents_df = non_isolated_patents_df.sort_values(by='input_degree', ascending=False)
 non_isolated_patents_df.to_excel('graphs/non_isolated_patents_df.xlsx')
-nx.write_edgelist(G_no_isolated, "graphs/non_isolated_graph.edgelist")
+G_no_isolated.save("graphs/non_isolated_graph")
 print(f'Non isolated patents shape: {non_isolated_patents_df.shape}')
 
 
 # 4. Create an interactive plot
 # -----------------------------
 
-# Load the additional data
+# Load the patents
 path = '../extraction/biblio_output/'
-patents = utils.get_patents_citations(path)
+patents = corpus_cache.load_patents(path)
 abstract_dict = {patent['patent_number']: patent.get('abstract', 'Unavailable information') for patent in patents}
 invention_title_dict = {patent['patent_number']: patent.get('invention_title', 'Unavailable information') for patent in patents}
 
 # Load the graph
-G_to_plot = nx.read_edgelist("graphs/non_isolated_graph.edgelist", create_using=nx.DiGraph())
+G_to_plot = CitationGraph.load("graphs/non_isolated_graph").to_networkx()
 
 # Add the abstract and title to the nodes
 for node in G_to_plot.nodes():
@@ -154,4 +124,22 @@ with open("interactive_plots/interactive_plot.html", "r") as f:
 title_html = "<h1 style='text-align: center;'>Citation Network of Patents (Filtered: Non-Isolated)</h1>\n"
 html_content = html_content.replace("<body>", f"<body>\n{title_html}")
 with open("interactive_plots/interactive_plot.html", "w") as f:
-    f.write(html_content)
\ No newline at end of file
+    f.write(html_content)
+
+
+# 5. Co-citation and bibliographic coupling networks
+# ---------------------------------------------------
+
+min_weight = 2
+top_k = 20
+relationship_edges = {
+    'cocitation': citation_networks.cocitation_edges(G, min_weight, top_k),
+    'coupling': citation_networks.coupling_edges(G, min_weight, top_k),
+}
+for name, edges in relationship_edges.items():
+    G_relationship = citation_networks.edges_to_networkx(edges)
+    partition = community_louvain.best_partition(G_relationship, weight='weight') if len(edges) else {}
+    edges.to_csv(f'graphs/{name}_edges.csv', index=False)
+    communities = pd.DataFrame(list(partition.items()), columns=['patent_number', 'community'])
+    communities.to_csv(f'graphs/{name}_communities.csv', index=False)
+    print(f'{name} network: {G_relationship.number_of_nodes()} patents, {len(edges)} edges, {len(set(partition.values()))} communities')
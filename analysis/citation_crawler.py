@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+
+sys.path.append('..')
+
+import extraction.fetcher as fetcher
+import extraction.manifest as fm
+from extraction.records import load_records
+from extraction.xml_records import NON_PATENT_PREFIXES
+
+import graph_metrics
+import utils
+from citation_graph import CitationGraph
+
+
+FRONTIER_NAME = 'crawler_frontier.json'
+PRIORITIES = ('in_degree', 'pagerank')
+
+
+class CitationCrawler:
+    def __init__(self, path, output_path, client, manifest, store=None, max_depth=2, budget=500, priority='in_degree',
+                 max_in_flight=8, rate=2.0, batch_size=1, round_size=100, frontier_path=None):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority}, expected one of {PRIORITIES}")
+        self.path = path
+        self.output_path = output_path
+        self.client = client
+        self.manifest = manifest
+        self.store = store
+        self.max_depth = max_depth
+        self.budget = budget
+        self.priority = priority
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.batch_size = batch_size
+        self.round_size = round_size
+        self.frontier_path = frontier_path or os.path.join(path, FRONTIER_NAME)
+        self.depth = {}
+        self.current_depth = 1
+        self.total_requests = 0
+        self.graph = None
+        self.attempted = set()
+
+    def load(self):
+        if not os.path.exists(self.frontier_path):
+            return False
+        with open(self.frontier_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.depth = state['depth']
+        self.current_depth = state['current_depth']
+        self.total_requests = state['total_requests']
+        return True
+
+    def save(self):
+        state = {'current_depth': self.current_depth, 'total_requests': self.total_requests, 'depth': self.depth}
+        tmp_path = self.frontier_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.frontier_path)
+
+    def reset(self):
+        if os.path.exists(self.frontier_path):
+            os.remove(self.frontier_path)
+        self.depth = {}
+        self.current_depth = 1
+        self.total_requests = 0
+
+    def expand(self, patents):
+        for patent in patents:
+            depth = self.depth.setdefault(patent['patent_number'], 0)
+            for cite in patent['citations']:
+                if self.depth.get(cite, depth + 2) > depth + 1:
+                    self.depth[cite] = depth + 1
+
+    def scores(self):
+        if self.priority == 'pagerank':
+            values = graph_metrics.pagerank(self.graph.to_scipy())
+        else:
+            values = self.graph.in_degree()
+        return dict(zip(self.graph.nodes.tolist(), values.tolist()))
+
+    def pending(self, depth):
+        citing = self.graph.citing_nodes()
+        return [
+            number for number, number_depth in self.depth.items()
+            if number_depth == depth and number not in citing and not number.startswith(NON_PATENT_PREFIXES)
+            and not self.manifest.done(number) and number not in self.attempted
+        ]
+
+    def sent_requests(self):
+        # Throttling retries and token-refresh re-sends use OPS quota too, so the budget counts
+        # every retrieval response the client saw, not the fetcher's logical requests
+        return self.client.metrics.request_count('retrieval')
+
+    def round_limit(self, requests):
+        if self.batch_size == 1:
+            return requests
+        return requests * self.batch_size // (self.batch_size + 1)
+
+    def fetched_patents(self, numbers):
+        patents = []
+        for number in numbers:
+            if self.manifest.status(number) == fm.OK:
+                patents.extend(patent for patent in load_records(os.path.join(self.output_path, f"{number}.json"))
+                               if patent.citations)
+        return patents
+
+    def run(self):
+        if self.load():
+            print(f"Frontera reanudada: profundidad {self.current_depth}, {len(self.depth)} nodos conocidos")
+        patents = utils.get_patents_citations(self.path)
+        self.graph = CitationGraph.from_patents(patents)
+        self.expand(patents)
+        # Documents that failed in a previous run pull the frontier back to their depth
+        retry_depths = [depth for depth in range(1, self.current_depth) if self.pending(depth)]
+        if retry_depths:
+            self.current_depth = retry_depths[0]
+        requests = 0
+        while requests < self.budget and self.current_depth <= self.max_depth:
+            pending = self.pending(self.current_depth)
+            if not pending:
+                self.current_depth += 1
+                self.save()
+                continue
+            scores = self.scores()
+            pending.sort(key=lambda number: (-scores.get(number, 0), number))
+            batch = pending[:min(self.round_size, self.round_limit(self.budget - requests))]
+            if not batch:
+                break
+            print(f"Profundidad {self.current_depth}: {len(pending)} pendientes, consultando {len(batch)} "
+                  f"(prioridad máxima {scores.get(batch[0], 0):.4g})")
+            sent = self.sent_requests()
+            fetcher.fetch_biblios(batch, self.output_path, self.client, self.max_in_flight, self.rate,
+                                  self.batch_size, None, self.store, self.manifest)
+            # Transient errors are retried on the next run, not again in this one
+            self.attempted.update(batch)
+            sent = self.sent_requests() - sent
+            requests += sent
+            self.total_requests += sent
+            new_patents = self.fetched_patents(batch)
+            self.expand(new_patents)
+            self.graph = self.graph.extend(new_patents)
+            self.save()
+        return requests
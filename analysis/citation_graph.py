@@ -0,0 +1,171 @@
+import json
+import os
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+
+FORMAT_VERSION = 1
+ARRAYS = ('nodes', 'indptr', 'indices', 'in_indptr', 'in_indices')
+
+
+def compress(rows, cols, n):
+    order = np.lexsort((cols, rows))
+    rows, cols = rows[order], cols[order]
+    if len(rows):
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        rows, cols = rows[keep], cols[keep]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols.astype(np.int32)
+
+
+def index_citations(patents, index):
+    sources, targets = [], []
+    for patent in patents:
+        source = index.setdefault(patent['patent_number'], len(index))
+        for cite in patent['citations']:
+            sources.append(source)
+            targets.append(index.setdefault(cite, len(index)))
+    return sources, targets
+
+
+def save_array(file, array):
+    tmp_file = file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_file, file)
+
+
+class CitationGraph:
+    def __init__(self, nodes, indptr, indices, in_indptr=None, in_indices=None):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        if in_indptr is None:
+            rows = np.repeat(np.arange(len(nodes), dtype=np.int32), np.diff(indptr))
+            in_indptr, in_indices = compress(indices, rows, len(nodes))
+        self.in_indptr = in_indptr
+        self.in_indices = in_indices
+        self._index = None
+
+    @classmethod
+    def from_edges(cls, nodes, sources, targets):
+        nodes = np.asarray(nodes, dtype=str)
+        indptr, indices = compress(np.asarray(sources, dtype=np.int32), np.asarray(targets, dtype=np.int32), len(nodes))
+        return cls(nodes, indptr, indices)
+
+    @classmethod
+    def from_patents(cls, patents):
+        index = {}
+        sources, targets = index_citations(patents, index)
+        return cls.from_edges(list(index), sources, targets)
+
+    def extend(self, patents):
+        index = dict(self.index)
+        sources, targets = index_citations(patents, index)
+        new_nodes = np.asarray(list(index)[len(self.nodes):], dtype=str)
+        old_sources, old_targets = self.edge_arrays()
+        return CitationGraph.from_edges(
+            np.concatenate([self.nodes, new_nodes]),
+            np.concatenate([old_sources, np.asarray(sources, dtype=np.int32)]),
+            np.concatenate([old_targets, np.asarray(targets, dtype=np.int32)]),
+        )
+
+    def citing_nodes(self):
+        return set(self.nodes[self.out_degree() > 0].tolist())
+
+    def built_from(self, patents):
+        # Extending the graph only matches a full rebuild while every citing node still has
+        # exactly the citations it was built from
+        citations = {}
+        for patent in patents:
+            citations.setdefault(patent['patent_number'], set()).update(patent['citations'])
+        return all(set(self.successors(node).tolist()) == citations.get(node) for node in self.citing_nodes())
+
+    @classmethod
+    def from_networkx(cls, G):
+        index = {node: i for i, node in enumerate(G)}
+        edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int32).reshape(-1, 2)
+        return cls.from_edges(list(index), edges[:, 0], edges[:, 1])
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {node: i for i, node in enumerate(self.nodes.tolist())}
+        return self._index
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.diff(self.in_indptr)
+
+    def degree(self):
+        return self.in_degree() + self.out_degree()
+
+    def successors(self, node):
+        i = self.index[node]
+        return self.nodes[self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def predecessors(self, node):
+        i = self.index[node]
+        return self.nodes[self.in_indices[self.in_indptr[i]:self.in_indptr[i + 1]]]
+
+    def edge_arrays(self):
+        sources = np.repeat(np.arange(len(self.nodes), dtype=np.int32), self.out_degree())
+        return sources, np.asarray(self.indices)
+
+    def to_scipy(self):
+        n = len(self.nodes)
+        data = np.ones(len(self.indices), dtype=np.float64)
+        return sparse.csr_matrix((data, np.asarray(self.indices), np.asarray(self.indptr)), shape=(n, n))
+
+    def subgraph(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        new_ids = np.full(len(self.nodes), -1, dtype=np.int64)
+        new_ids[mask] = np.arange(mask.sum())
+        sources, targets = self.edge_arrays()
+        keep = mask[sources] & mask[targets]
+        return CitationGraph.from_edges(self.nodes[mask], new_ids[sources[keep]], new_ids[targets[keep]])
+
+    def filter_in_degree(self, threshold=0):
+        return self.subgraph(self.in_degree() > threshold)
+
+    def non_isolated(self):
+        return self.subgraph(self.degree() > 0)
+
+    def to_networkx(self, attributes=None):
+        G = nx.DiGraph()
+        nodes = self.nodes.tolist()
+        if attributes:
+            G.add_nodes_from((node, attributes.get(node, {})) for node in nodes)
+        else:
+            G.add_nodes_from(nodes)
+        sources, targets = self.edge_arrays()
+        G.add_edges_from(zip(self.nodes[sources].tolist(), self.nodes[targets].tolist()))
+        return G
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            save_array(os.path.join(path, f'{name}.npy'), np.asarray(getattr(self, name)))
+        with open(os.path.join(path, 'graph.json'), 'w', encoding='utf-8') as f:
+            json.dump({'version': FORMAT_VERSION, 'nodes': len(self.nodes), 'edges': self.number_of_edges()}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, 'graph.json'), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        if info['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported graph format {info['version']} in {path}")
+        arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS]
+        return cls(*arrays)
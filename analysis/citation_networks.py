@@ -0,0 +1,50 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def top_k_per_row(M, k):
+    M = sparse.csr_matrix(M)
+    rows = np.repeat(np.arange(M.shape[0]), np.diff(M.indptr))
+    order = np.lexsort((-M.data, rows))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - M.indptr[rows[order]]
+    keep = rank < k
+    return sparse.csr_matrix((M.data[keep], (rows[keep], M.indices[keep])), shape=M.shape)
+
+
+def prune(M, min_weight=2, top_k=None):
+    M = sparse.csr_matrix(M)
+    M.setdiag(0)
+    M.data[M.data < min_weight] = 0
+    M.eliminate_zeros()
+    if top_k:
+        kept = top_k_per_row(M, top_k)
+        M = M.multiply((kept + kept.T) > 0).tocsr()
+    return M
+
+
+def edge_table(M, nodes):
+    upper = sparse.triu(M, k=1).tocoo()
+    nodes = np.asarray(nodes)
+    edges = pd.DataFrame({
+        'source': nodes[upper.row],
+        'target': nodes[upper.col],
+        'weight': upper.data.astype(np.int64),
+    })
+    return edges.sort_values(by='weight', ascending=False, ignore_index=True)
+
+
+def cocitation_edges(graph, min_weight=2, top_k=20):
+    A = graph.to_scipy()
+    return edge_table(prune(A.T @ A, min_weight, top_k), graph.nodes)
+
+
+def coupling_edges(graph, min_weight=2, top_k=20):
+    A = graph.to_scipy()
+    return edge_table(prune(A @ A.T, min_weight, top_k), graph.nodes)
+
+
+def edges_to_networkx(edges):
+    return nx.from_pandas_edgelist(edges, 'source', 'target', edge_attr='weight')
@@ -0,0 +1,126 @@
+import glob
+import hashlib
+import os
+import pickle
+
+import utils
+
+
+CACHE_DIR = 'cache'
+CACHE_VERSION = 3
+_memory = {}
+
+
+def cache_file(path, cache_dir=CACHE_DIR):
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"corpus_{key}.pkl")
+
+
+def store_fingerprint(path):
+    store_path = utils.patent_store.store_path(path)
+    fingerprint = []
+    for file in (store_path, store_path + '-wal'):
+        if os.path.exists(file):
+            stat = os.stat(file)
+            fingerprint.append((os.path.basename(file), stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def files_fingerprint(path):
+    fingerprint = {}
+    for file in glob.glob(path + '/*/*.json'):
+        stat = os.stat(file)
+        fingerprint[file] = (stat.st_size, stat.st_mtime_ns)
+    return fingerprint
+
+
+def fingerprint(path):
+    if os.path.exists(utils.patent_store.store_path(path)):
+        return store_fingerprint(path)
+    return files_fingerprint(path)
+
+
+def read_cache(file):
+    if not os.path.exists(file):
+        return None
+    try:
+        with open(file, 'rb') as f:
+            return pickle.load(f)
+    except (pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def write_cache(file, cache):
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    tmp_file = file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, file)
+
+
+def load_patents(path, cache_dir=CACHE_DIR):
+    file = cache_file(path, cache_dir)
+    use_store = os.path.exists(utils.patent_store.store_path(path))
+    fingerprint = store_fingerprint(path) if use_store else files_fingerprint(path)
+
+    memo = _memory.get(file)
+    if memo and memo[0] == fingerprint:
+        return pickle.loads(memo[1])
+
+    cache = read_cache(file) or {}
+    if cache.get('version') != CACHE_VERSION:
+        cache = {}
+    if use_store:
+        if cache.get('store') != fingerprint:
+            cache = {'version': CACHE_VERSION, 'store': fingerprint, 'patents': utils.get_patents_citations_from_store(path)}
+            write_cache(file, cache)
+        patents = cache['patents']
+    else:
+        entries = cache.get('files', {})
+        changed = 0
+        files = {}
+        for json_file, stat in fingerprint.items():
+            entry = entries.get(json_file)
+            if entry is None or entry[0] != stat:
+                entry = (stat, utils.parse_patent_file(json_file))
+                changed += 1
+            files[json_file] = entry
+        if changed or len(files) != len(entries) or 'store' in cache:
+            cache = {'version': CACHE_VERSION, 'files': files}
+            write_cache(file, cache)
+            print(f'Corpus cache updated: {changed} files parsed, {len(files) - changed} reused')
+        patents = [patent for entry in files.values() for patent in entry[1]]
+
+    data = pickle.dumps(patents, protocol=pickle.HIGHEST_PROTOCOL)
+    _memory[file] = (fingerprint, data)
+    return pickle.loads(data)
+
+
+def invalidate(path=None, cache_dir=CACHE_DIR):
+    files = [cache_file(path, cache_dir)] if path else glob.glob(os.path.join(cache_dir, 'corpus_*.pkl'))
+    for file in files:
+        _memory.pop(file, None)
+        if os.path.exists(file):
+            os.remove(file)
+    return len(files)
+
+
+def cache_report(cache_dir=CACHE_DIR):
+    report = []
+    for file in sorted(glob.glob(os.path.join(cache_dir, 'corpus_*.pkl'))):
+        cache = read_cache(file) or {}
+        if 'store' in cache:
+            source, entries = 'store', len(cache['patents'])
+        else:
+            source, entries = 'files', len(cache.get('files', {}))
+        report.append({'cache_file': file, 'source': source, 'entries': entries, 'bytes': os.path.getsize(file)})
+    return report
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        print(f'Removed {invalidate(sys.argv[2] if len(sys.argv) > 2 else None)} cache files')
+    else:
+        for entry in cache_report():
+            print(f"{entry['cache_file']}: {entry['source']}, {entry['entries']} entries, {entry['bytes'] / 1e6:.1f} MB")
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+from citation_graph import save_array
+
+
+STORE_VERSION = 1
+MAX_CHUNKS = 32
+
+
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+def content_key(model_name, text):
+    return hashlib.sha1(f'{model_name}\0{normalize_text(text)}'.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path, model_name, dtype=np.float32):
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.path = os.path.join(path, hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:12] + f'_{self.dtype.name}')
+        os.makedirs(self.path, exist_ok=True)
+        self.chunks = []
+        self.dim = None
+        self.keys = np.empty(0, dtype='U40')
+        self.vectors = []
+        self.row = {}
+        self.load()
+
+    def header_file(self):
+        return os.path.join(self.path, 'store.json')
+
+    def load(self):
+        if not os.path.exists(self.header_file()):
+            return
+        with open(self.header_file(), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if (header.get('version') != STORE_VERSION or header.get('model') != self.model_name
+                or header.get('dtype') != self.dtype.name):
+            return
+        self.chunks = header['chunks']
+        self.dim = header['dim']
+        keys = [np.load(os.path.join(self.path, f'keys_{chunk}.npy')) for chunk in self.chunks]
+        self.vectors = [np.load(os.path.join(self.path, f'vectors_{chunk}.npy'), mmap_mode='r') for chunk in self.chunks]
+        self.keys = np.concatenate(keys) if keys else self.keys
+        self.row = {key: i for i, key in enumerate(self.keys.tolist())}
+
+    def write_header(self):
+        header = {'version': STORE_VERSION, 'model': self.model_name, 'dtype': self.dtype.name, 'dim': self.dim,
+                  'chunks': self.chunks}
+        with open(self.header_file() + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(header, f)
+        os.replace(self.header_file() + '.tmp', self.header_file())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.row
+
+    def missing(self, keys):
+        return [key for key in dict.fromkeys(keys) if key not in self.row]
+
+    def add(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        if not len(keys):
+            return
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dim})")
+        chunk = f'{(int(self.chunks[-1]) + 1) if self.chunks else 0:05d}'
+        keys = np.asarray(keys, dtype='U40')
+        save_array(os.path.join(self.path, f'vectors_{chunk}.npy'), vectors)
+        save_array(os.path.join(self.path, f'keys_{chunk}.npy'), keys)
+        self.chunks.append(chunk)
+        self.dim = vectors.shape[1]
+        self.write_header()
+        start = len(self.keys)
+        self.keys = np.concatenate([self.keys, keys])
+        self.vectors.append(vectors)
+        self.row.update((key, start + i) for i, key in enumerate(keys.tolist()))
+        if len(self.chunks) > MAX_CHUNKS:
+            self.compact()
+
+    def matrix(self):
+        if not self.vectors:
+            return np.empty((0, self.dim or 0), dtype=self.dtype)
+        return np.concatenate(self.vectors) if len(self.vectors) > 1 else np.asarray(self.vectors[0])
+
+    def get(self, keys):
+        return self.matrix()[[self.row[key] for key in keys]]
+
+    def compact(self, keep=None):
+        keys = self.keys.tolist() if keep is None else [key for key in dict.fromkeys(keep) if key in self.row]
+        vectors = self.get(keys)
+        old_chunks = self.chunks
+        self.chunks, self.keys, self.vectors, self.row = [], np.empty(0, dtype='U40'), [], {}
+        chunk = f'{int(old_chunks[-1]) + 1:05d}' if old_chunks else '00000'
+        save_array(os.path.join(self.path, f'vectors_{chunk}.npy'), vectors)
+        save_array(os.path.join(self.path, f'keys_{chunk}.npy'), np.asarray(keys, dtype='U40'))
+        self.chunks = [chunk]
+        self.write_header()
+        for old in old_chunks:
+            for name in ('vectors', 'keys'):
+                os.remove(os.path.join(self.path, f'{name}_{old}.npy'))
+        self.load()
+        return len(keys)
+
+    def encode(self, texts, encode_function, batch_size=4096):
+        keys = [content_key(self.model_name, text) for text in texts]
+        missing = self.missing(keys)
+        if missing:
+            text_by_key = {key: normalize_text(text) for key, text in zip(keys, texts)}
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                self.add(batch, encode_function([text_by_key[key] for key in batch]))
+        return keys, len(missing)
+
+
+def save_aligned(path, patent_ids, embeddings, model_name):
+    os.makedirs(path, exist_ok=True)
+    embeddings = np.asarray(embeddings)
+    embeddings = embeddings.astype(np.float16 if embeddings.dtype == np.float16 else np.float32)
+    save_array(os.path.join(path, 'embeddings.npy'), embeddings)
+    save_array(os.path.join(path, 'patent_ids.npy'), np.asarray(patent_ids, dtype=str))
+    with open(os.path.join(path, 'embeddings.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump({'model': model_name, 'count': len(patent_ids), 'dim': int(embeddings.shape[1]),
+                   'dtype': embeddings.dtype.name}, f)
+    os.replace(os.path.join(path, 'embeddings.json.tmp'), os.path.join(path, 'embeddings.json'))
+
+
+def load_aligned(path, patent_ids=None):
+    embeddings = np.load(os.path.join(path, 'embeddings.npy'), mmap_mode='r')
+    ids_file = os.path.join(path, 'patent_ids.npy')
+    if not os.path.exists(ids_file):
+        raise FileNotFoundError(f"{ids_file} not found, run generate_embeddings.py to rebuild the aligned embeddings")
+    stored_ids = np.load(ids_file)
+    if patent_ids is None:
+        return stored_ids.tolist(), np.asarray(embeddings, dtype=np.float32)
+    row = {patent_id: i for i, patent_id in enumerate(stored_ids.tolist())}
+    missing = [patent_id for patent_id in patent_ids if patent_id not in row]
+    if missing:
+        raise KeyError(f"{len(missing)} patents have no embedding (e.g. {missing[0]}), run generate_embeddings.py")
+    return list(patent_ids), embeddings[[row[patent_id] for patent_id in patent_ids]].astype(np.float32)
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+ONNX_QUANTIZATION = 'avx2'
+_worker_model = None
+
+
+def load_model(model_name, backend='torch', onnx_path='embeddings/onnx'):
+    from sentence_transformers import SentenceTransformer
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+    if backend in ('torch', 'int8'):
+        model = SentenceTransformer(model_name, device='cpu')
+        if backend == 'int8':
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+    try:
+        if backend == 'onnx':
+            return SentenceTransformer(model_name, device='cpu', backend='onnx')
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        local_path = os.path.join(onnx_path, model_name.replace('/', '__'))
+        file_name = f'onnx/model_qint8_{ONNX_QUANTIZATION}.onnx'
+        if not os.path.exists(os.path.join(local_path, file_name)):
+            model = SentenceTransformer(model_name, device='cpu', backend='onnx')
+            model.save(local_path)
+            export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, local_path)
+        return SentenceTransformer(local_path, device='cpu', backend='onnx', model_kwargs={'file_name': file_name})
+    except ImportError as e:
+        raise ImportError(f"The {backend} backend needs sentence-transformers>=3.2 with "
+                          f"optimum and onnxruntime (pip install 'sentence-transformers[onnx]'): {e}")
+
+
+def load_tokenizer(model_name):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name)
+
+
+def token_lengths(tokenizer, texts, max_length=512):
+    encoded = tokenizer(list(texts), add_special_tokens=True, truncation=True, max_length=max_length)
+    return np.array([len(ids) for ids in encoded['input_ids']], dtype=np.int64)
+
+
+def length_sorted_batches(lengths, max_tokens=16384, max_batch=256):
+    # Texts of similar length share a batch, so padding stays small, and the batch size
+    # grows for short texts as long as the padded batch fits in max_tokens.
+    order = np.argsort(lengths, kind='stable')
+    batches, batch, longest = [], [], 0
+    for i in order.tolist():
+        longest_with = max(longest, int(lengths[i]))
+        if batch and (longest_with * (len(batch) + 1) > max_tokens or len(batch) >= max_batch):
+            batches.append(batch)
+            batch, longest_with = [], int(lengths[i])
+        batch.append(i)
+        longest = longest_with
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def init_worker(model_name, backend, threads):
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = load_model(model_name, backend)
+
+
+def encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True).astype(np.float32)
+
+
+class Encoder:
+    def __init__(self, model_name, backend='torch', workers=1, max_tokens=16384, max_length=512):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+        self.model_name = model_name
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.max_tokens = max_tokens
+        self.max_length = max_length
+        self.model = None
+        self.tokenizer = None
+        self.executor = None
+
+    @property
+    def name(self):
+        # Quantized backends give slightly different vectors, so they are cached separately
+        return self.model_name if self.backend == 'torch' else f'{self.model_name}#{self.backend}'
+
+    def start(self):
+        if self.workers == 1:
+            self.model = self.model or load_model(self.model_name, self.backend)
+        elif self.executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                                initargs=(self.model_name, self.backend, threads))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self.start()
+        self.tokenizer = self.tokenizer or load_tokenizer(self.model_name)
+        lengths = token_lengths(self.tokenizer, texts, self.max_length)
+        batches = length_sorted_batches(lengths, self.max_tokens)
+        text_batches = [[texts[i] for i in batch] for batch in batches]
+        if self.executor is None:
+            results = (self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True) for batch in text_batches)
+        else:
+            results = self.executor.map(encode_batch, text_batches)
+        embeddings = None
+        for batch, vectors in zip(batches, results):
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[batch] = vectors
+        return embeddings
@@ -1,23 +1,45 @@
-from sentence_transformers import SentenceTransformer
+import argparse
 import os
-import numpy as np
 
-import utils
+import corpus_cache
+import embedding_store
+from encoder import BACKENDS, Encoder
 
-# 1. Load data
-# ------------
-input_path = '../extraction/biblio_output/'
-output_path = 'lda/'
-os.makedirs(output_path, exist_ok=True)
-patents = utils.get_patents_citations(input_path)
-abstract_dict = {patent['patent_number']: patent.get('abstract', 'Unavailable information') for patent in patents}
-n_patents = len(abstract_dict)
+# Under spawn the encoder workers re-import this module, so the script runs behind a guard
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode patent abstracts with a sentence-transformer model")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="int8, onnx and onnx-int8 are faster CPU backends with a small cosine drift")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="encoder processes, each with its own copy of the model")
+    parser.add_argument("--max-tokens", type=int, default=16384, help="padded tokens per length-sorted batch")
+    parser.add_argument("--dtype", choices=("float32", "float16"), default="float32",
+                        help="storage type of the vectors")
+    args = parser.parse_args()
 
+    # 1. Load data
+    # ------------
+    input_path = '../extraction/biblio_output/'
+    output_path = 'embeddings/'
+    model_name = 'intfloat/multilingual-e5-large'
+    os.makedirs(output_path, exist_ok=True)
+    patents = corpus_cache.load_patents(input_path)
+    abstract_dict = {patent['patent_number']: patent.get('abstract', 'Unavailable information') for patent in patents}
+    n_patents = len(abstract_dict)
 
-# 2. Generate embeddings
-# ----------------------
-model = SentenceTransformer('intfloat/multilingual-e5-large')
-abstracts = list(abstract_dict.values())
-embeddings = model.encode(abstracts)
-embeddings_path = 'embeddings/embeddings.npy'
-np.save(embeddings_path, embeddings)
\ No newline at end of file
+
+    # 2. Generate embeddings
+    # ----------------------
+    # Vectors are cached by a hash of the model name and the normalized abstract, so only
+    # new or changed abstracts are sent to the model.
+    encoder = Encoder(model_name, args.backend, args.workers, args.max_tokens)
+    store = embedding_store.EmbeddingStore(os.path.join(output_path, 'store'), encoder.name, args.dtype)
+    patent_ids = list(abstract_dict.keys())
+    with encoder:
+        keys, n_encoded = store.encode(list(abstract_dict.values()), encoder.encode)
+    print(f'{n_patents} patents: {n_encoded} abstracts encoded, {n_patents - n_encoded} reused from the cache')
+
+
+    # 3. Save embeddings aligned with the patent ids
+    # ----------------------------------------------
+    embedding_store.save_aligned(output_path, patent_ids, store.get(keys), encoder.name)
@@ -1,48 +1,51 @@
-import pandas as pd
-import networkx as nx
+import argparse
 import os
 import sys
 from dotenv import load_dotenv
-import time
-import json
 
 sys.path.append( '..')
 
 import extraction.utils as eu
+from extraction.client import OPSClient
+from extraction.store import PatentStore
+from extraction.manifest import FetchManifest
+from citation_crawler import PRIORITIES, CitationCrawler
 
 
 load_dotenv()
 CLIENT_KEY = os.getenv("CLIENT_KEY")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
-check_paths = ["../extraction/biblio_output/low_carbon_hydrogen", "../extraction/biblio_output/energy_hydrogen", "../extraction/biblio_output/additional_data"]
-output_path = "../extraction/biblio_output/additional_data"
+MAX_IN_FLIGHT = int(os.getenv("OPS_MAX_IN_FLIGHT", "8"))
+RATE = float(os.getenv("OPS_RATE", "2.0"))
+BATCH_SIZE = int(os.getenv("OPS_BATCH_SIZE", str(eu.BULK_LIMIT)))
+
+parser = argparse.ArgumentParser(description="Descarga los documentos citados que faltan, empezando por los más citados")
+parser.add_argument("--path", default="../extraction/biblio_output")
+parser.add_argument("--depth", type=int, default=2, help="número máximo de saltos desde el corpus")
+parser.add_argument("--budget", type=int, default=500, help="número máximo de consultas a OPS en esta ejecución")
+parser.add_argument("--priority", choices=PRIORITIES, default="in_degree")
+parser.add_argument("--reset", action="store_true", help="descarta la frontera guardada")
+args = parser.parse_args()
+
+check_paths = [os.path.join(args.path, topic) for topic in ("low_carbon_hydrogen", "energy_hydrogen", "additional_data")]
+output_path = os.path.join(args.path, "additional_data")
 os.makedirs(output_path, exist_ok=True)
 
-total_patents = pd.read_excel('total_patents_df.xlsx')
-total_patents = total_patents.rename(columns={'Unnamed: 0': 'id'})
-total_patents = total_patents.head(50)
-id_list = total_patents['id'].tolist()
-
-G_no_isolated = nx.read_edgelist("graphs/non_isolated_graph.edgelist", create_using=nx.DiGraph())
-patent_numbers = list(G_no_isolated.nodes())
-
-total_list = id_list + patent_numbers
-
-access_token = eu.get_access_token(CLIENT_KEY, CLIENT_SECRET)
-
-patents = []
-for id in total_list:
-    filename = f"{id}.json"
-    if not eu.file_exists_in_any_subfolder(filename, check_paths):
-        print(f"Guardando {filename}")
-        time.sleep(5)
-        response = eu.get_patent_biblio(id, access_token)
-        if response:
-            biblio_dict = eu.xml_to_dict(response)
-            with open(os.path.join(output_path, filename), "w") as f:
-                json.dump(biblio_dict, f, indent=4, ensure_ascii=False)
-            print(f"Guardado {output_path}/{filename}")
-    else:
-        print(f"{output_path}/{filename} ya existe, omitiendo")
-
+client = OPSClient(CLIENT_KEY, CLIENT_SECRET, pool_size=MAX_IN_FLIGHT)
+store = PatentStore(args.path)
+imported = store.import_json_dir(args.path)
+if imported:
+    print(f"{imported} documentos JSON importados en {store.path}")
+manifest = FetchManifest(args.path)
+if not manifest.entries:
+    manifest.bootstrap(check_paths)
+
+crawler = CitationCrawler(args.path, output_path, client, manifest, store, args.depth, args.budget, args.priority,
+                          MAX_IN_FLIGHT, RATE, BATCH_SIZE)
+if args.reset:
+    crawler.reset()
+requests = crawler.run()
+print(f"{requests} consultas, profundidad {crawler.current_depth}, {crawler.total_requests} consultas en total")
+print(f"Estado de throttling: {client.throttle.state()}")
+store.close()
+manifest.close()
@@ -0,0 +1,127 @@
+import json
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import linalg
+
+
+METRICS_VERSION = 1
+
+def adjacency_matrix(G, nodelist=None):
+    if nodelist is None and hasattr(G, 'to_scipy'):
+        return G.to_scipy(), G.nodes.tolist()
+    nodelist = list(G) if nodelist is None else nodelist
+    if not nodelist:
+        return sparse.csr_matrix((0, 0)), nodelist
+    A = nx.to_scipy_sparse_array(G, nodelist=nodelist, weight=None, dtype=np.float64, format='csr')
+    return sparse.csr_matrix(A), nodelist
+
+
+def degrees(A):
+    in_degree = np.asarray(A.sum(axis=0)).ravel().astype(np.int64)
+    out_degree = np.asarray(A.sum(axis=1)).ravel().astype(np.int64)
+    return in_degree, out_degree
+
+
+def pagerank(A, alpha=0.85, max_iter=100, tol=1.0e-6, start=None):
+    n = A.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    out_weight = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse = np.zeros(n)
+    inverse[~dangling] = 1.0 / out_weight[~dangling]
+    Q = sparse.diags(inverse) @ A
+    p = np.full(n, 1.0 / n)
+    x = p.copy() if start is None else start / start.sum()
+    for _ in range(max_iter):
+        last = x
+        x = alpha * (x @ Q + x[dangling].sum() * p) + (1 - alpha) * p
+        if np.abs(x - last).sum() < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
+def hits(A, max_iter=100, tol=1.0e-8):
+    n = A.shape[0]
+    if n < 2 or A.nnz == 0:
+        return np.zeros(n), np.zeros(n)
+    u, _, vt = linalg.svds(A, k=1, maxiter=max_iter * n, tol=tol)
+    hubs, authorities = np.abs(u[:, 0]), np.abs(vt[0])
+    return hubs / hubs.sum(), authorities / authorities.sum()
+
+
+def core_numbers(A):
+    S = sparse.csr_matrix(A + A.T)
+    S.setdiag(0)
+    S.eliminate_zeros()
+    degree = np.asarray(S.sum(axis=1)).ravel()
+    core = np.zeros(S.shape[0], dtype=np.int64)
+    alive = np.ones(S.shape[0], dtype=bool)
+    k = 0
+    while alive.any():
+        k = max(k, int(degree[alive].min()))
+        while True:
+            peel = alive & (degree <= k)
+            if not peel.any():
+                break
+            core[peel] = k
+            alive[peel] = False
+            degree -= S @ peel.astype(np.float64)
+    return core
+
+
+def compute_metrics(G, alpha=0.85, start=None):
+    # start: PageRank of a previous run (a Series indexed by node) to warm-start the iteration
+    A, nodelist = adjacency_matrix(G)
+    in_degree, out_degree = degrees(A)
+    if start is not None:
+        start = start.reindex(nodelist).fillna(1.0 / len(nodelist)).to_numpy()
+    hubs, authorities = hits(A)
+    return pd.DataFrame({
+        'input_degree': in_degree,
+        'output_degree': out_degree,
+        'pagerank': pagerank(A, alpha=alpha, start=start),
+        'hub': hubs,
+        'authority': authorities,
+        'core_number': core_numbers(A),
+    }, index=pd.Index(nodelist))
+
+
+def save_metrics(metrics, path, corpus=None):
+    columns = {column: metrics[column].to_numpy() for column in metrics.columns}
+    file = os.path.join(path, 'metrics.npz')
+    with open(file + '.tmp', 'wb') as f:
+        np.savez(f, nodes=metrics.index.to_numpy(dtype=str), **columns)
+    os.replace(file + '.tmp', file)
+    # The corpus fingerprint tells the next run whether the saved graph and metrics are still current
+    info_file = os.path.join(path, 'metrics.json')
+    with open(info_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': METRICS_VERSION, 'corpus': corpus}, f)
+    os.replace(info_file + '.tmp', info_file)
+
+
+def metrics_info(path):
+    file = os.path.join(path, 'metrics.json')
+    if not os.path.exists(file):
+        return None
+    with open(file, 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    return info if info.get('version') == METRICS_VERSION else None
+
+
+def same_corpus(path, corpus):
+    info = metrics_info(path)
+    return info is not None and info['corpus'] == json.loads(json.dumps(corpus))
+
+
+def load_metrics(path):
+    file = os.path.join(path, 'metrics.npz')
+    if not os.path.exists(file) or metrics_info(path) is None:
+        return None
+    with np.load(file) as data:
+        columns = {column: data[column] for column in data.files if column != 'nodes'}
+        return pd.DataFrame(columns, index=pd.Index(data['nodes'].tolist()))
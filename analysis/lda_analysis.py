@@ -18,6 +18,8 @@ import pyLDAvis.lda_model
 import pickle
 
 import utils
+import corpus_cache
+import text_pipeline
 
 # 1. Load data
 # ------------
@@ -26,7 +28,7 @@ input_path = '../extraction/biblio_output/'
 output_path = 'lda/'
 os.makedirs(output_path, exist_ok=True)
 
-patents = utils.get_patents_citations(input_path)
+patents = corpus_cache.load_patents(input_path)
 abstract_dict = {patent['patent_number']: patent.get('abstract', 'Unavailable information') for patent in patents}
 df = pd.DataFrame(list(abstract_dict.items()), columns=['PatentID', 'Abstract'])
 
@@ -34,7 +36,10 @@ df = pd.DataFrame(list(abstract_dict.items()), columns=['PatentID', 'Abstract'])
 # ------------------
 
 
-df['Cleaned_Abstract'] = df['Abstract'].apply(utils.clean_text)
+# Cleaned tokens are cached by abstract text in cache/clean_tokens.pkl, so only new or
+# changed abstracts are lemmatized
+df['Tokens'] = text_pipeline.clean_corpus(df['Abstract'].tolist())
+df['Cleaned_Abstract'] = df['Tokens'].apply(' '.join)
 
 # 3. Vectorize data
 # -----------------
@@ -155,7 +160,7 @@ plt.savefig(os.path.join(output_path, 'lda_umap_plot.png'), dpi=300)
 # 11. Topic Coherence Evaluation
 # ------------------------------
 
-# texts = df['Cleaned_Abstract'].apply(lambda x: x.split())
+# texts = df['Tokens']
 # dictionary = corpora.Dictionary(texts)
 # corpus = [dictionary.doc2bow(text) for text in texts]
 
@@ -1,37 +1,46 @@
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from community import community_louvain
 import networkx as nx
 from pyvis.network import Network
 import os
 import pandas as pd
-import numpy as np
 import textwrap
 import random
 from sklearn.cluster import KMeans
 
 import utils
+import corpus_cache
+import similarity
+import ann_index
+import embedding_store
 
-# 1. Load embeddings
-# ------------------
-input_path = 'embeddings/embeddings.npy'
-embeddings = np.load(input_path)
-
-# 2. Load data
+# 1. Load data
 # ------------
 
 input_path = '../extraction/biblio_output/'
 output_path = 'lda/'
 os.makedirs(output_path, exist_ok=True)
 
-patents = utils.get_patents_citations(input_path)
+patents = corpus_cache.load_patents(input_path)
 abstract_dict = {patent['patent_number']: patent.get('abstract', 'Unavailable information') for patent in patents}
 title_dict = {patent['patent_number']: patent.get('invention_title', 'Unavailable information') for patent in patents}
 
+# 2. Load embeddings
+# ------------------
+# Rows are looked up by patent id, so the order of the corpus does not matter
+patent_ids, embeddings = embedding_store.load_aligned('embeddings/', list(abstract_dict.keys()))
 
-# 3. Compute cosine similarity matrix
-# -----------------------------------
-similarity_matrix = cosine_similarity(embeddings)
+
+# 3. Compute similarity edges
+# ---------------------------
+# 'threshold' keeps every pair above the cosine threshold; 'knn' links each patent to its
+# k nearest neighbours from the persisted ANN index (symmetrized).
+similarity_mode = 'threshold'
+if similarity_mode == 'knn':
+    index = ann_index.load_or_build('embeddings/ann_index', embeddings, backend='ivf')
+    similarity_edges = ann_index.knn_graph(index, k=10)
+else:
+    similarity_edges = similarity.similarity_edges(embeddings, threshold=0.9)
 
 
 # 4. Create a graph
@@ -44,13 +53,8 @@ for i, patent_id in enumerate(abstract_dict.keys()):
     title = title_dict.get(patent_id, 'Unavailable information')
     G_09.add_node(patent_id, abstract=abstract, title=title)
 
-# Add edges based on similarity_matrix
-for i in range(len(abstract_dict)):
-    for j in range(i + 1, len(abstract_dict)):
-        if similarity_matrix[i][j] > 0.9:
-            patent_id = list(abstract_dict.keys())[i]
-            other_patent_id = list(abstract_dict.keys())[j]
-            G_09.add_edge(patent_id, other_patent_id, weight=float(similarity_matrix[i][j]))
+# Add edges above the similarity threshold
+G_09.add_weighted_edges_from(similarity.edge_list(similarity_edges, patent_ids))
 
 print(f'Number of nodes: {G_09.number_of_nodes()}')
 print(f'Number of edges: {G_09.number_of_edges()}')
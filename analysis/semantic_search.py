@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import ann_index
+import corpus_cache
+import embedding_store
+import similarity
+from encoder import load_model
+
+
+UNAVAILABLE = 'Unavailable information'
+
+
+class SemanticSearch:
+    def __init__(self, embeddings_path='embeddings/', corpus_path='../extraction/biblio_output/', model_name=None,
+                 index='exact', n_probe=16):
+        patent_ids, embeddings = embedding_store.load_aligned(embeddings_path)
+        self.patent_ids = np.asarray(patent_ids)
+        self.row = {patent_id: i for i, patent_id in enumerate(patent_ids)}
+        self.embeddings = similarity.normalize(embeddings)
+        self.model_name = model_name or self.stored_model(embeddings_path)
+        self.model = None
+        self.lock = threading.Lock()
+        self.index = None
+        self.n_probe = n_probe
+        if index != 'exact':
+            self.index = ann_index.load_or_build(os.path.join(embeddings_path, 'ann_index'), embeddings, backend=index)
+
+        records = {patent['patent_number']: patent for patent in corpus_cache.load_patents(corpus_path)}
+        self.titles, self.countries, self.years = [], [], np.zeros(len(patent_ids), dtype=np.int32)
+        for i, patent_id in enumerate(patent_ids):
+            record = records.get(patent_id)
+            self.titles.append(' '.join(record.invention_title.split()) if record else UNAVAILABLE)
+            self.countries.append((record.country_code or '') if record else '')
+            self.years[i] = (record.year or 0) if record else 0
+        self.countries = np.asarray(self.countries)
+
+    @staticmethod
+    def stored_model(embeddings_path):
+        with open(os.path.join(embeddings_path, 'embeddings.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)['model']
+
+    def load_encoder(self):
+        # The stored model name carries the backend (e.g. "...#int8"), so queries are
+        # encoded exactly like the corpus was
+        with self.lock:
+            if self.model is None:
+                model_name, _, backend = self.model_name.partition('#')
+                self.model = load_model(model_name, backend or 'torch')
+        return self.model
+
+    def encode(self, text):
+        model = self.load_encoder()
+        with self.lock:
+            vector = model.encode([text], convert_to_numpy=True)
+        return similarity.normalize(vector)[0]
+
+    def mask(self, year_from=None, year_to=None, countries=None):
+        mask = np.ones(len(self.patent_ids), dtype=bool)
+        if year_from:
+            mask &= self.years >= year_from
+        if year_to:
+            mask &= (self.years <= year_to) & (self.years > 0)
+        if countries:
+            mask &= np.isin(self.countries, [country.upper() for country in countries])
+        return mask
+
+    def search(self, text=None, patent=None, k=10, year_from=None, year_to=None, countries=None):
+        if k < 1:
+            raise ValueError('k must be at least 1')
+        if patent is not None:
+            if patent not in self.row:
+                raise KeyError(f'{patent} is not in the embedded corpus')
+            query = self.embeddings[self.row[patent]]
+        elif text:
+            query = self.encode(text)
+        else:
+            raise ValueError('A query text or a patent number is required')
+        mask = self.mask(year_from, year_to, countries)
+        if patent is not None:
+            mask[self.row[patent]] = False
+
+        if self.index is not None:
+            # Over-fetch from the ANN index and filter afterwards; fall back to the exact
+            # scan when the filters leave too few candidates
+            ids, scores = self.index.search(query, max(4 * k, 50), self.n_probe) if self.index.backend == 'ivf' \
+                else self.index.search(query, max(4 * k, 50))
+            ids, scores = ids[0], scores[0]
+            keep = (ids >= 0) & mask[np.maximum(ids, 0)]
+            ids, scores = ids[keep][:k], scores[keep][:k]
+            if len(ids) == min(k, int(mask.sum())):
+                return self.results(ids, scores)
+
+        scores = self.embeddings @ query
+        scores[~mask] = -np.inf
+        k = min(k, int(mask.sum()))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self.results(top, scores[top])
+
+    def results(self, ids, scores):
+        return [{
+            'patent_number': str(self.patent_ids[i]),
+            'title': self.titles[i],
+            'year': int(self.years[i]) or None,
+            'country': str(self.countries[i]) or None,
+            'score': round(float(score), 4),
+        } for i, score in zip(ids.tolist(), scores.tolist())]
+
+    def serve(self, port=8090, host='127.0.0.1'):
+        # Load the model before accepting requests so the first text query does not pay for it
+        self.load_encoder()
+        engine = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != '/search':
+                    return self.send(404, {'error': 'Use /search?q=<text> or /search?patent=<number>'})
+                params = parse_qs(url.query)
+                value = lambda name, cast=str: cast(params[name][0]) if name in params else None
+                try:
+                    start = time.perf_counter()
+                    results = engine.search(value('q'), value('patent'), value('k', int) if 'k' in params else 10,
+                                            value('year_from', int), value('year_to', int), params.get('country'))
+                    elapsed = (time.perf_counter() - start) * 1000
+                    self.send(200, {'results': results, 'ms': round(elapsed, 2)})
+                except (KeyError, ValueError) as e:
+                    self.send(400, {'error': str(e).strip("'")})
+
+            def send(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+
+def print_results(results, elapsed):
+    for rank, result in enumerate(results, 1):
+        print(f"{rank:>3}. {result['score']:.4f}  {result['patent_number']:<16} {result['year'] or '----'}  "
+              f"{result['country'] or '--'}  {result['title']}")
+    print(f'({len(results)} results in {elapsed * 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find the patents closest to a text or to another patent')
+    parser.add_argument('query', nargs='?', help='free text; without it queries are read from stdin')
+    parser.add_argument('--patent', help='use the embedding of this patent number as the query')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--year-from', type=int)
+    parser.add_argument('--year-to', type=int)
+    parser.add_argument('--country', action='append', help='country code, can be repeated')
+    parser.add_argument('--index', choices=('exact',) + ann_index.BACKENDS, default='exact')
+    parser.add_argument('--embeddings', default='embeddings/')
+    parser.add_argument('--corpus', default='../extraction/biblio_output/')
+    parser.add_argument('--serve', action='store_true', help='start the HTTP endpoint instead of answering once')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    args = parser.parse_args()
+    if args.k < 1:
+        parser.error('-k must be at least 1')
+
+    engine = SemanticSearch(args.embeddings, args.corpus, index=args.index)
+    filters = {'k': args.k, 'year_from': args.year_from, 'year_to': args.year_to, 'countries': args.country}
+    if args.serve:
+        server = engine.serve(args.port, args.host)
+        print(f'Semantic search on http://{args.host}:{server.server_port}/search?q=...')
+        server.serve_forever()
+    elif args.query or args.patent:
+        if not args.patent:
+            engine.load_encoder()
+        start = time.perf_counter()
+        results = engine.search(args.query, args.patent, **filters)
+        print_results(results, time.perf_counter() - start)
+    else:
+        engine.load_encoder()
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            start = time.perf_counter()
+            try:
+                results = engine.search(None, line, **filters) if line in engine.row else engine.search(line, **filters)
+            except (KeyError, ValueError) as e:
+                print(e)
+                continue
+            print_results(results, time.perf_counter() - start)
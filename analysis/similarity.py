@@ -0,0 +1,33 @@
+import numpy as np
+from scipy import sparse
+
+
+def normalize(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    # Rows that are already unit length are left as they are, so normalizing twice gives
+    # the same bytes
+    norms[(norms == 0) | (np.abs(norms - 1) < 1e-6)] = 1.0
+    return embeddings / norms
+
+
+def similarity_edges(embeddings, threshold=0.9, block_size=1024):
+    X = normalize(embeddings)
+    n = len(X)
+    rows, cols, weights = [], [], []
+    for start in range(0, n, block_size):
+        block = X[start:start + block_size] @ X[start:].T
+        i, j = np.nonzero(block > threshold)
+        keep = j > i
+        i, j = i[keep], j[keep]
+        rows.append(i + start)
+        cols.append(j + start)
+        weights.append(block[i, j])
+    if not rows:
+        return sparse.coo_matrix((n, n), dtype=np.float32)
+    return sparse.coo_matrix((np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+
+def edge_list(edges, nodes):
+    nodes = np.asarray(nodes)
+    return zip(nodes[edges.row].tolist(), nodes[edges.col].tolist(), edges.data.astype(float).tolist())
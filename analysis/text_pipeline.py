@@ -0,0 +1,113 @@
+import hashlib
+import os
+import pickle
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+
+CACHE_PATH = 'cache/clean_tokens.pkl'
+CACHE_VERSION = 1
+LEMMA_CACHE_SIZE = 200000
+NON_LETTERS = re.compile(r'[^a-z\s]')
+_resources = None
+
+
+def resources():
+    # Stop words and the lemmatizer are built once per process instead of once per call
+    global _resources
+    if _resources is None:
+        import nltk
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+        lemmatizer = WordNetLemmatizer()
+        try:
+            # WordNet loads lazily, so lemmatize once to find out whether it is installed
+            stop_words = frozenset(stopwords.words('english'))
+            lemmatizer.lemmatize('patents')
+        except LookupError:
+            nltk.download('stopwords')
+            nltk.download('wordnet')
+            stop_words = frozenset(stopwords.words('english'))
+        _resources = (stop_words, lemmatizer)
+    return _resources
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word):
+    return sys.intern(resources()[1].lemmatize(word))
+
+
+def clean_tokens(text):
+    stop_words = resources()[0]
+    return [lemmatize(word) for word in NON_LETTERS.sub('', text.lower()).split() if word not in stop_words]
+
+
+def clean_text(text):
+    return ' '.join(clean_tokens(text))
+
+
+def clean_chunk(texts):
+    return [clean_tokens(text) for text in texts]
+
+
+def clean_many(texts, workers=1, chunk_size=500):
+    # Under spawn each pool worker re-imports the calling script, so the pool is only used
+    # when a caller asks for it from behind a __main__ guard
+    texts = list(texts)
+    if workers == 1 or len(texts) < 2 * chunk_size:
+        return clean_chunk(texts)
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [tokens for chunk in executor.map(clean_chunk, chunks) for tokens in chunk]
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+
+class TokenCache:
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.tokens = {}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                cache = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            return
+        if cache.get('version') == CACHE_VERSION:
+            self.tokens = cache['tokens']
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.tmp', 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'tokens': self.tokens}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + '.tmp', self.path)
+        self.changed = False
+
+    def clean(self, texts, workers=1):
+        texts = [text or '' for text in texts]
+        keys = [text_key(text) for text in texts]
+        missing = {key: text for key, text in zip(keys, texts) if key not in self.tokens}
+        if missing:
+            cleaned = clean_many(missing.values(), workers)
+            self.tokens.update((key, tuple(sys.intern(token) for token in tokens))
+                               for key, tokens in zip(missing, cleaned))
+            self.changed = True
+        return [list(self.tokens[key]) for key in keys]
+
+
+def clean_corpus(texts, path=CACHE_PATH, workers=1):
+    cache = TokenCache(path)
+    tokens = cache.clean(texts, workers)
+    cache.save()
+    return tokens
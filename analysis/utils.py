@@ -1,150 +1,77 @@
 import os
 import sys
-import json
 import glob
 import pandas as pd
-import networkx as nx
 import re
 import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+
+import graph_metrics
+import text_pipeline
 
 nltk.download('stopwords')
 nltk.download('wordnet')
 
 sys.path.append('..')
 
-with open('../country_codes.json', 'r', encoding='utf-8') as f:
-    country_codes = json.load(f)
+import extraction.store as patent_store
+from extraction.records import PatentRecord, country_codes, load_records
+from extraction.records import country_name as get_country_name
+
+
+def get_patents_citations_from_store(path):
+    store = patent_store.PatentStore(path, readonly=True)
+    patents = [PatentRecord.from_row(row) for row in store.iter_patents() if row['citations']]
+    store.close()
+    return patents
 
-def get_country_name(country_code):
-    return country_codes.get(country_code, "Unavailable information")
+
+def parse_patent_file(file):
+    return [patent for patent in load_records(file) if patent.patent_number and patent.citations]
 
 
 def get_patents_citations(path):
+    if os.path.exists(patent_store.store_path(path)):
+        return get_patents_citations_from_store(path)
     patents = []
     files = glob.glob(path + '/*/*.json')
     for file in files:
         if file.endswith('.json'):
-            patent_number = os.path.splitext(os.path.basename(file))[0]
-            with open(file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                exchange_documents = data.get("exchange-documents", {}).get("exchange-document")
-                if isinstance(exchange_documents, dict):
-                    exchange_documents = [exchange_documents]
-                for document in exchange_documents:
-                    patent = {}
-                    patent['patent_number'] = patent_number
-                    abstract_data = document.get("abstract", "Unavailable information")
-                    abstract = "Unavailable information"
-                    if isinstance(abstract_data, dict):
-                        abstract = abstract_data.get("p", "Unavailable information")
-                    elif isinstance(abstract_data, list):
-                        for entry in abstract_data:
-                            if isinstance(entry, dict):
-                                text = entry.get("p", "")
-                                if text and (text.isascii() or all(ord(char) < 128 for char in text)):
-                                    abstract = text
-                                    break
-                        else:
-                            abstract = abstract_data[0].get("p", "Unavailable information")
-                    patent['abstract'] = abstract
-                    references_data = document.get("bibliographic-data", {}).get("references-cited")
-                    citations = set()
-                    if references_data:
-                        references = references_data.get("citation", [])
-                        if isinstance(references, list):
-                            for ref in references:
-                                ref_doc_id = ref.get("patcit", {}).get("document-id")
-                                if isinstance(ref_doc_id, list) and ref_doc_id:
-                                    for doc in ref_doc_id:
-                                        doc_number = doc.get('doc-number')
-                                        country = doc.get('country')
-                                        if doc_number:
-                                            no_country_code_version = doc_number if not country else doc_number.replace(country, '').strip()
-                                            if no_country_code_version in citations and country:
-                                                citations.remove(no_country_code_version)
-                                            if country:
-                                                citations.add(country + doc_number)
-                                            else:
-                                                citations.add(doc_number)
-                    patent['citations'] = list(citations)
-                    bibliographic_data = document.get("bibliographic-data", {})
-                    invention_title_data = bibliographic_data.get("invention-title", "Unavailable information")
-                    invention_title = "Unavailable information"
-                    if isinstance(invention_title_data, list):
-                        for title in invention_title_data:
-                            if title and (title.isascii() or all(ord(char) < 128 for char in title)):
-                                invention_title = title
-                                break
-                        else:
-                            invention_title = invention_title_data[0]
-                    elif isinstance(invention_title_data, str):
-                        invention_title = invention_title_data
-                    patent['invention_title'] = invention_title
-                    inventors = bibliographic_data.get("parties", {}).get("inventors", {}).get("inventor", [])
-                    inventor_names = []
-                    if isinstance(inventors, list):
-                        for inv in inventors:
-                            name = inv.get("inventor-name", {}).get("name", "Unavailable information")
-                            inventor_names.append(name)
-                    elif isinstance(inventors, dict):
-                        name = inventors.get("inventor-name", {}).get("name", "Unavailable information")
-                        inventor_names.append(name)
-                    patent['inventor_names'] = inventor_names
-                    invention_titles = bibliographic_data.get("parties", {}).get("invention-title", "Unavailable information")
-                    invention_title_names = []
-                    if isinstance(invention_titles, list):
-                        for inv_title in invention_titles:
-                            title = inv_title.get("invention-title", "Unavailable information")
-                            invention_title_names.append(title)
-                    elif isinstance(invention_titles, dict):
-                        title = invention_titles.get("invention-title", "Unavailable information")
-                        invention_title_names.append(title)
-                    patent['invention_title_names'] = invention_title_names
-                    applicants = bibliographic_data.get("parties", {}).get("applicants", {}).get("applicant", [])
-                    applicant_names = []
-                    if isinstance(applicants, list):
-                        for app in applicants:
-                            name = app.get("applicant-name", {}).get("name", "Unavailable information")
-                            applicant_names.append(name)
-                    elif isinstance(applicants, dict):
-                        name = applicants.get("applicant-name", {}).get("name", "Unavailable information")
-                        applicant_names.append(name)
-                    patent['applicant_names'] = applicant_names
-                    publication_reference = bibliographic_data.get("publication-reference", {}).get("document-id", [])
-                    year = publication_reference[0].get("date", "Unavailable information")[:4] if publication_reference else "Unavailable information"
-                    country_code = publication_reference[0].get("country", "Unavailable information") if publication_reference else "Unavailable information"
-                    country = get_country_name(country_code)
-                    patent['year'] = year
-                    patent['country'] = country
-                    if patent.get('patent_number') and citations:
-                        patents.append(patent)
+            patents.extend(parse_patent_file(file))
     return patents
 
 
 def convert_grafo_to_df(G):
-    input_degree = dict(G.in_degree())
-    output_degree = dict(G.out_degree())
-    pagerank = nx.pagerank(G)
-    patents_info = {}
-    for patent in G.nodes():
-        patents_info[patent] = {
-            'input_degree': input_degree[patent],
-            'output_degree': output_degree[patent],
-            'pagerank': pagerank[patent],
+    return graph_metrics.compute_metrics(G)
+
+
+def patents_dataframe(G, patents, metrics_df):
+    node_attributes = {
+        patent['patent_number']: {
+            'abstract': patent.get('abstract', 'Unavailable information'),
+            'year': patent.get('year', 'Unavailable information'),
+            'inventor_names': patent.get('inventor_names', 'Unavailable information'),
+            'applicant_names': patent.get('applicant_names', 'Unavailable information'),
+            'country': patent.get('country', 'Unavailable information'),
+            'invention_title': patent.get('invention_title', 'Unavailable information')
         }
-    patents_df = pd.DataFrame(patents_info).T
-    return patents_df
+        for patent in patents
+    }
+
+    node_data = []
+    for node in G.nodes.tolist():
+        data = dict(node_attributes.get(node, {}))
+        data['patent_number'] = node
+        data['abstract'] = data.get('abstract', 'Unavailable information')
+        data['year'] = data.get('year', 'Unavailable information')
+        data['inventor_names'] = data.get('inventor_names', 'Unavailable information')
+        data['applicant_names'] = data.get('applicant_names', 'Unavailable information')
+        data['country'] = data.get('country', 'Unavailable information')
+        node_data.append(data)
+    patents_df = pd.DataFrame(node_data).join(metrics_df, on='patent_number')
+    return patents_df.sort_values(by='input_degree', ascending=False)
 
 def clean_text(text):
-    lemmatizer = WordNetLemmatizer()
-    stop_words = set(stopwords.words('english'))
-    text = text.lower()
-    text = re.sub(r'[^a-z\s]', '', text)
-    tokens = text.split()
-    tokens = [lemmatizer.lemmatize(word) for word in tokens if word not in stop_words]
-    return ' '.join(tokens)
+    return text_pipeline.clean_text(text)
 
 
 def clean_and_deduplicate_names(names):
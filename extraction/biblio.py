@@ -1,14 +1,23 @@
-import requests
 import json
-import time
 import os
-import xml.etree.ElementTree as ET
-import utils
+import sys
 from dotenv import load_dotenv
 
+sys.path.append('..')
+
+import extraction.utils as utils
+import extraction.fetcher as fetcher
+from extraction.client import OPSClient
+from extraction.store import PatentStore
+from extraction.manifest import FetchManifest
+
 load_dotenv()
 CLIENT_KEY = os.getenv("CLIENT_KEY")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+MAX_IN_FLIGHT = int(os.getenv("OPS_MAX_IN_FLIGHT", "8"))
+RATE = float(os.getenv("OPS_RATE", "2.0"))
+BATCH_SIZE = int(os.getenv("OPS_BATCH_SIZE", str(utils.BULK_LIMIT)))
+RAW_PATH = os.getenv("OPS_RAW_PATH", "raw_output")
 
 
 
@@ -18,34 +27,32 @@ for output_path in output_paths:
     os.makedirs(output_path, exist_ok=True)
 keywords = ['"Low Carbon Hydrogen"', '"Energy Hydrogen"']
 keywords_mapping = zip(keywords, output_paths)
-
-access_token = utils.get_access_token(CLIENT_KEY, CLIENT_SECRET)
-token_time = time.time()
-
-if access_token:
-    for keyword, output_path in keywords_mapping:
-        with open(os.path.join('search_patents', f"{keyword}_1_2000.json"), "r") as f:
-            publication_references = json.load(f)
-            for doc in publication_references:
-                if time.time() - token_time >= 900:
-                    access_token = utils.get_access_token(CLIENT_KEY, CLIENT_SECRET)
-                    token_time = time.time()
-                    print("Access token regenerado.")
-
-                doc_id = doc['document-id']
-                doc_number = doc_id['doc-number']['$']
-                doc_kind_code = doc_id['kind']['$']
-                doc_country = doc_id['country']['$']
-                doc_metadata = f"{doc_country}{doc_number}"
-                filename = f"{doc_metadata}.json"
-                if not utils.file_exists_in_any_subfolder(filename, output_paths):
-                    print(f"Obteniendo biblio para {doc_metadata}")
-                    time.sleep(5)
-                    response = utils.get_patent_biblio(doc_metadata, access_token)
-                    if response:
-                        biblio_dict = utils.xml_to_dict(response)
-                        with open(os.path.join(output_path, filename), "w") as f:
-                            json.dump(biblio_dict, f, indent=4, ensure_ascii=False)
-                        print(f"Guardado {output_path}/{filename}")
-                else:
-                    print(f"{output_path}/{filename} ya existe, omitiendo")
+client = OPSClient(CLIENT_KEY, CLIENT_SECRET, pool_size=MAX_IN_FLIGHT)
+store = PatentStore("biblio_output")
+# Documents saved as JSON before the store existed would otherwise be invisible to the analysis
+imported = store.import_json_dir("biblio_output")
+if imported:
+    print(f"{imported} documentos JSON importados en {store.path}")
+manifest = FetchManifest("biblio_output")
+if not manifest.entries:
+    print(f"Manifiesto inicializado con {manifest.bootstrap(output_paths)} documentos existentes")
+
+for keyword, output_path in keywords_mapping:
+    search_path = os.path.join('search_patents', f"{keyword}.json")
+    if not os.path.exists(search_path):
+        search_path = os.path.join('search_patents', f"{keyword}_1_2000.json")
+    with open(search_path, "r") as f:
+        publication_references = json.load(f)
+    pending = []
+    for doc in publication_references:
+        doc_metadata = fetcher.publication_number(doc)
+        if not manifest.done(doc_metadata):
+            pending.append(doc_metadata)
+        else:
+            print(f"{doc_metadata} ya procesado ({manifest.status(doc_metadata)}), omitiendo")
+    raw_path = os.path.join(RAW_PATH, os.path.basename(output_path)) if RAW_PATH else None
+    stats = fetcher.fetch_biblios(pending, output_path, client, MAX_IN_FLIGHT, RATE, BATCH_SIZE, raw_path, store, manifest)
+    print(f"{keyword}: {stats['ok']} guardados, {stats['error']} errores, {stats['requests']} consultas")
+    print(f"Estado de throttling: {client.throttle.state()}")
+store.close()
+manifest.close()
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import extraction.utils as eu
+from extraction.telemetry import METRICS_PATH, Metrics
+from extraction.throttle import ThrottleController
+
+
+TOKEN_TTL = 1199
+TOKEN_MARGIN = 60
+
+
+class TokenManager:
+    def __init__(self, client_key, client_secret, session, ttl=TOKEN_TTL, margin=TOKEN_MARGIN):
+        self.client_key = client_key
+        self.client_secret = client_secret
+        self.session = session
+        self.ttl = ttl
+        self.margin = margin
+        self.token = None
+        self.expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.token is None or time.monotonic() >= self.expires_at - self.margin:
+                self.token = eu.get_access_token(self.client_key, self.client_secret, session=self.session)
+                self.expires_at = time.monotonic() + self.ttl
+                if self.token:
+                    print("Access token regenerado.")
+            return self.token
+
+    def invalidate(self, token):
+        with self._lock:
+            if self.token == token:
+                self.token = None
+
+
+class OPSClient:
+    def __init__(self, client_key, client_secret, pool_size=16, throttle=None, metrics=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=1),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.tokens = TokenManager(client_key, client_secret, self.session)
+        self.throttle = throttle or ThrottleController()
+        self.metrics = metrics or Metrics(os.getenv("OPS_METRICS_PATH", METRICS_PATH))
+        self.session.hooks["response"].append(self.metrics.response_hook)
+        if os.getenv("OPS_METRICS_PORT"):
+            port = self.metrics.serve(int(os.getenv("OPS_METRICS_PORT")))
+            print(f"Métricas disponibles en http://127.0.0.1:{port}/metrics")
+
+    def request(self, method, url, service, headers=None, **kwargs):
+        for _ in range(2):
+            token = self.tokens.get()
+            request_headers = dict(headers or {})
+            if token:
+                request_headers["Authorization"] = f"Bearer {token}"
+            response = self.throttle.request(self.session, method, url, service, headers=request_headers, **kwargs)
+            if response.status_code != 401:
+                return response
+            self.tokens.invalidate(token)
+        return response
+
+    def get(self, url, service, **kwargs):
+        return self.request("GET", url, service, **kwargs)
+
+    def post(self, url, service, **kwargs):
+        return self.request("POST", url, service, **kwargs)
+
+    def close(self):
+        self.session.close()
+        self.metrics.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,100 +1,180 @@
+import argparse
 import json
 import glob
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-def get_country_name(country_code):
-    return country_codes.get(country_code, "Unavailable information")
+sys.path.append('..')
+
+import extraction.xml_records as xr
+from extraction.records import UNAVAILABLE, PatentRecord
+
+
+def extract_patent_fields(patent_json):
+    documents = xr.records_from_json(patent_json, "")
+    record = PatentRecord.from_record(max(documents, key=lambda doc: doc["date"] or "")) if documents else PatentRecord("")
+    return {
+        "invention_title": record.invention_title,
+        "inventors": ', '.join(record.inventor_names) if record.inventor_names else UNAVAILABLE,
+        "applicants": ', '.join(record.applicant_names) if record.applicant_names else UNAVAILABLE,
+        "year": record.year_text,
+        "country": record.country,
+        "abstract": record.abstract,
+    }
 
 
 def extract_patent_info_clean(patent_json):
-    exchange_documents = patent_json.get("exchange-documents", {}).get("exchange-document", [])
-
-    if not isinstance(exchange_documents, list):
-        exchange_documents = [exchange_documents]
-    if len(exchange_documents) > 1:
-        exchange_documents.sort(key=lambda doc: doc.get("bibliographic-data", {}).get("publication-reference", {}).get("document-id", [])[0].get("date", ""), reverse=True)
-    exchange_document = exchange_documents[0] if exchange_documents else {}
-    bibliographic_data = exchange_document.get("bibliographic-data", {})
-    abstract_data = exchange_document.get("abstract", "Unavailable information")
-    abstract = "Unavailable information"
-    if isinstance(abstract_data, dict):
-        abstract = abstract_data.get("p", "Unavailable information")
-    elif isinstance(abstract_data, list):
-        for entry in abstract_data:
-            if isinstance(entry, dict):
-                text = entry.get("p", "")
-                if text and (text.isascii() or all(ord(char) < 128 for char in text)):
-                    abstract = text
-                    break
-        else:
-            abstract = abstract_data[0].get("p", "Unavailable information")
-    invention_title_data = bibliographic_data.get("invention-title", "Unavailable information")
-    invention_title = "Unavailable information"
-    if isinstance(invention_title_data, list):
-        for title in invention_title_data:
-            if title and (title.isascii() or all(ord(char) < 128 for char in title)):
-                invention_title = title
-                break
-        else:
-            invention_title = invention_title_data[0]
-    elif isinstance(invention_title_data, str):
-        invention_title = invention_title_data
-    inventors = bibliographic_data.get("parties", {}).get("inventors", {}).get("inventor", [])
-    inventor_names = []
-    if isinstance(inventors, list):
-        for inv in inventors:
-            name = inv.get("inventor-name", {}).get("name", "Unavailable information")
-            inventor_names.append(name)
-    elif isinstance(inventors, dict):
-        name = inventors.get("inventor-name", {}).get("name", "Unavailable information")
-        inventor_names.append(name)
-    applicants = bibliographic_data.get("parties", {}).get("applicants", {}).get("applicant", [])
-    applicant_names = []
-    if isinstance(applicants, list):
-        for app in applicants:
-            name = app.get("applicant-name", {}).get("name", "Unavailable information")
-            applicant_names.append(name)
-    elif isinstance(applicants, dict):
-        name = applicants.get("applicant-name", {}).get("name", "Unavailable information")
-        applicant_names.append(name)
-    publication_reference = bibliographic_data.get("publication-reference", {}).get("document-id", [])
-    year = publication_reference[0].get("date", "Unavailable information")[:4] if publication_reference else "Unavailable information"
-    country_code = publication_reference[0].get("country", "Unavailable information") if publication_reference else "Unavailable information"
-    country = get_country_name(country_code) 
+    fields = extract_patent_fields(patent_json)
     output = (
-        f"Invention Title: {invention_title}\n"
-        f"Inventors: {', '.join(inventor_names) if inventor_names else 'Unavailable information'}\n"
-        f"Applicants: {', '.join(applicant_names) if applicant_names else 'Unavailable information'}\n"
-        f"Year: {year}\n"
-        f"Country: {country}\n"
-        f"Abstract: {abstract}\n"
+        f"Invention Title: {fields['invention_title']}\n"
+        f"Inventors: {fields['inventors']}\n"
+        f"Applicants: {fields['applicants']}\n"
+        f"Year: {fields['year']}\n"
+        f"Country: {fields['country']}\n"
+        f"Abstract: {fields['abstract']}\n"
     )
     return output
 
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+with open(os.path.join(BASE_DIR, 'dirs_mapping.json'), 'r', encoding='utf-8') as f:
+    dirs_mapping = json.load(f)
+
+
+def output_path(file_path, output_dir):
+    return os.path.join(output_dir, os.path.basename(file_path).replace('.json', '.txt'))
+
+
+def is_stale(file_path, target):
+    try:
+        return os.stat(target).st_mtime < os.stat(file_path).st_mtime
+    except FileNotFoundError:
+        return True
+
+
+def load_patent(file_path):
+    dir_name = os.path.basename(os.path.dirname(file_path))
+    with open(file_path, "r") as file:
+        return json.load(file), dirs_mapping.get(dir_name, dir_name)
+
 
-with open('../country_codes.json', 'r', encoding='utf-8') as f:
-    country_codes = json.load(f)
+def convert_file(file_path):
+    patent_json, keywords = load_patent(file_path)
+    formatted_output = extract_patent_info_clean(patent_json)
+    formatted_output += f"Keywords: {keywords}\n"
+    return formatted_output
 
-with open('dirs_mapping.json', 'r', encoding='utf-8') as f:
-    dirs_mapping = json.load(f) 
 
-dirs = ["biblio_output/energy_hydrogen/*.json", "biblio_output/low_carbon_hydrogen/*.json"]
+def write_txt(task):
+    file_path, target = task
+    try:
+        formatted_output = convert_file(file_path)
+        tmp_path = target + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(formatted_output)
+        os.replace(tmp_path, target)
+        return file_path, None
+    except Exception as e:
+        return file_path, str(e)
+
+
+def corpus_record(file_path):
+    try:
+        mtime = os.stat(file_path).st_mtime
+        patent_json, keywords = load_patent(file_path)
+        record = {
+            "patent_number": os.path.splitext(os.path.basename(file_path))[0],
+            "source": file_path,
+            "mtime": mtime,
+            **extract_patent_fields(patent_json),
+            "keywords": keywords,
+        }
+        return file_path, record, None
+    except Exception as e:
+        return file_path, None, str(e)
+
+
+def read_corpus(corpus_path):
+    if not os.path.exists(corpus_path):
+        return {}
+    if corpus_path.endswith(".parquet"):
+        import pandas as pd
+        return {record["source"]: record for record in pd.read_parquet(corpus_path).to_dict("records")}
+    records = {}
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record["source"]] = record
+    return records
+
+
+def write_corpus(corpus_path, records):
+    tmp_path = corpus_path + ".tmp"
+    if corpus_path.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(records).to_parquet(tmp_path, index=False)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, corpus_path)
+
+
+def convert_to_txt(files, output_dir, workers=None, force=False):
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(file_path, output_path(file_path, output_dir)) for file_path in files]
+    tasks = [task for task in tasks if force or is_stale(*task)]
+    print(f"{len(files) - len(tasks)} archivos al día, {len(tasks)} por convertir.")
+    errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_path, error in executor.map(write_txt, tasks, chunksize=64):
+            if error:
+                errors += 1
+                print(f"Error en el archivo {os.path.basename(file_path)}: {error}")
+    print(f"{len(tasks) - errors} archivos convertidos en {output_dir}.")
+
+
+def convert_to_corpus(files, corpus_path, workers=None, force=False):
+    existing = {} if force else read_corpus(corpus_path)
+    records, pending = [], []
+    for file_path in files:
+        record = existing.get(file_path)
+        if record is not None and record["mtime"] >= os.stat(file_path).st_mtime:
+            records.append(record)
+        else:
+            pending.append(file_path)
+    print(f"{len(records)} documentos al día, {len(pending)} por convertir.")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_path, record, error in executor.map(corpus_record, pending, chunksize=64):
+            if error:
+                print(f"Error en el archivo {os.path.basename(file_path)}: {error}")
+            else:
+                records.append(record)
+    if pending or len(records) != len(existing):
+        write_corpus(corpus_path, records)
+    print(f"{len(records)} documentos en {corpus_path}.")
+
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte los JSON de biblio_output a texto plano")
+    parser.add_argument("--input", default="biblio_output")
+    parser.add_argument("--topics", nargs="+", default=list(dirs_mapping))
+    parser.add_argument("--output", default="biblio_output/txt_files")
+    parser.add_argument("--corpus", help="escribe un único archivo .jsonl o .parquet en lugar de un .txt por patente")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="reconvierte aunque la salida esté al día")
+    args = parser.parse_args()
 
-for directory in dirs:
-    for file_path in glob.glob(directory):
-        try: 
-            dir_name = os.path.basename(os.path.dirname(file_path))
-            mapped_dir_name = dirs_mapping.get(dir_name, dir_name)
-            file_name = os.path.basename(file_path)
-            with open(file_path, "r") as file:
-                patent_json = json.load(file)
-            formatted_output = extract_patent_info_clean(patent_json)
-            formatted_output += f"Keywords: {mapped_dir_name}\n"
-            with open(f"biblio_output/txt_files/{file_name.replace('.json', '.txt')}", "w") as file:
-                file.write(formatted_output)
-            print(f"Archivo {file_name} procesado con éxito.")
-        except Exception as e:
-            print(f"Error en el archivo {file_name}: {str(e)}")
-            continue
\ No newline at end of file
+    files = sorted(file_path for topic in args.topics for file_path in glob.glob(f"{args.input}/{topic}/*.json"))
+    if args.corpus:
+        try:
+            convert_to_corpus(files, args.corpus, args.workers, args.force)
+        except ImportError as e:
+            print(f"No se pudo escribir {args.corpus}: {e}")
+    else:
+        convert_to_txt(files, args.output, args.workers, args.force)
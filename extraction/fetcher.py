@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import extraction.manifest as fm
+import extraction.utils as eu
+import extraction.xml_records as xr
+
+
+def publication_number(doc):
+    doc_id = doc['document-id']
+    return f"{doc_id['country']['$']}{doc_id['doc-number']['$']}"
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def save_biblio(records, output_path, filename):
+    tmp_path = os.path.join(output_path, filename + '.tmp')
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(output_path, filename))
+
+
+def save_raw(content, raw_path, doc_metadata):
+    with open(os.path.join(raw_path, f"{doc_metadata}.xml"), "wb") as f:
+        f.write(content)
+
+
+class BiblioFetcher:
+    def __init__(self, output_path, client, max_in_flight=8, rate=2.0, batch_size=1, raw_path=None, store=None, manifest=None):
+        self.output_path = output_path
+        self.topic = os.path.basename(os.path.normpath(output_path))
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.batch_size = max(1, min(batch_size, eu.BULK_LIMIT))
+        self.raw_path = raw_path
+        self.store = store
+        self.manifest = manifest
+        self.stats = {'ok': 0, 'error': 0, 'requests': 0}
+
+    def _save(self, doc_metadata, content):
+        # The XML is parsed once, straight into records, for both the store and the JSON file
+        records = xr.parse_biblio(content, doc_metadata)
+        if self.raw_path:
+            save_raw(content, self.raw_path, doc_metadata)
+        if self.store is not None:
+            self.store.add_records(doc_metadata, self.topic, records, content, "xml")
+        filename = f"{doc_metadata}.json"
+        save_biblio(records, self.output_path, filename)
+        return filename
+
+    def _record(self, doc_metadata, status):
+        if self.manifest is not None:
+            self.manifest.record(doc_metadata, status, self.topic)
+
+    async def _store(self, doc_metadata, content, status=fm.ERROR):
+        if content is None:
+            self.stats['error'] += 1
+            await self.loop.run_in_executor(self.executor, self._record, doc_metadata, status)
+            return
+        try:
+            filename = await self.loop.run_in_executor(self.executor, self._save, doc_metadata, content)
+        except ET.ParseError as e:
+            print(f"Error al analizar el XML de {doc_metadata}: {e}")
+            self.stats['error'] += 1
+            await self.loop.run_in_executor(self.executor, self._record, doc_metadata, fm.PARSE_ERROR)
+            return
+        await self.loop.run_in_executor(self.executor, self._record, doc_metadata, fm.OK)
+        self.stats['ok'] += 1
+        print(f"Guardado {self.output_path}/{filename}")
+
+    async def _fetch_one(self, doc_metadata):
+        async with self.semaphore:
+            await self.limiter.wait()
+            print(f"Obteniendo biblio para {doc_metadata}")
+            response = await self.loop.run_in_executor(self.executor, eu.get_patent_biblio_response, doc_metadata, self.client)
+        self.stats['requests'] += 1
+        if response.status_code == 200:
+            await self._store(doc_metadata, response.content)
+        elif response.status_code == 404:
+            print(f"Error 404: No se encontró biblio para el documento {doc_metadata}")
+            await self._store(doc_metadata, None, fm.NOT_FOUND)
+        else:
+            print(f"Error en la consulta de biblio ({response.status_code}) para el documento {doc_metadata}")
+            await self._store(doc_metadata, None)
+
+    async def _fetch_batch(self, batch):
+        async with self.semaphore:
+            await self.limiter.wait()
+            print(f"Obteniendo biblio para {len(batch)} documentos ({batch[0]} ... {batch[-1]})")
+            results = await self.loop.run_in_executor(self.executor, eu.get_patent_biblio_bulk, batch, self.client)
+        self.stats['requests'] += 1
+        if results is None:
+            print("Consulta en bloque fallida, consultando documento a documento")
+            for doc_metadata in batch:
+                await self._fetch_one(doc_metadata)
+            return
+        for doc_metadata in batch:
+            if doc_metadata in results:
+                await self._store(doc_metadata, ET.tostring(results[doc_metadata]))
+        for doc_metadata in batch:
+            if doc_metadata not in results:
+                await self._fetch_one(doc_metadata)
+
+    async def run(self, doc_numbers):
+        os.makedirs(self.output_path, exist_ok=True)
+        if self.raw_path:
+            os.makedirs(self.raw_path, exist_ok=True)
+        self.loop = asyncio.get_running_loop()
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.limiter = RateLimiter(self.rate)
+        doc_numbers = list(dict.fromkeys(doc_numbers))
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as self.executor:
+            if self.batch_size == 1:
+                tasks = [self._fetch_one(doc_metadata) for doc_metadata in doc_numbers]
+            else:
+                tasks = [
+                    self._fetch_batch(doc_numbers[i:i + self.batch_size])
+                    for i in range(0, len(doc_numbers), self.batch_size)
+                ]
+            await asyncio.gather(*tasks)
+        return self.stats
+
+
+def fetch_biblios(doc_numbers, output_path, client, max_in_flight=8, rate=2.0, batch_size=1, raw_path=None, store=None,
+                  manifest=None):
+    fetcher = BiblioFetcher(output_path, client, max_in_flight, rate, batch_size, raw_path, store, manifest)
+    return asyncio.run(fetcher.run(doc_numbers))
@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+
+
+MANIFEST_NAME = "manifest.jsonl"
+OK = "ok"
+NOT_FOUND = "404"
+PARSE_ERROR = "parse_error"
+ERROR = "error"
+FINAL_STATUSES = {OK, NOT_FOUND}
+
+
+class FetchManifest:
+    def __init__(self, path):
+        self.path = path if path.endswith(".jsonl") else os.path.join(path, MANIFEST_NAME)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.entries = {}
+        self._lock = threading.Lock()
+        lines = 0
+        torn = False
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry["number"]] = entry
+        if lines > 2 * len(self.entries) + 1000:
+            self.compact()
+        self._log = open(self.path, "a", encoding="utf-8")
+        if torn:
+            self._log.write("\n")
+
+    def status(self, number):
+        entry = self.entries.get(number)
+        return entry["status"] if entry else None
+
+    def done(self, number):
+        return self.status(number) in FINAL_STATUSES
+
+    def known(self, status=OK):
+        return {number for number, entry in self.entries.items() if entry["status"] == status}
+
+    def _append(self, entries):
+        lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        with self._lock:
+            self._log.write(lines)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            for entry in entries:
+                self.entries[entry["number"]] = entry
+
+    def record(self, number, status, topic=None):
+        self._append([{"number": number, "status": status, "topic": topic, "fetched_at": time.time()}])
+
+    def bootstrap(self, output_paths):
+        entries = []
+        now = time.time()
+        for output_path in output_paths:
+            if not os.path.isdir(output_path):
+                continue
+            topic = os.path.basename(os.path.normpath(output_path))
+            for entry in os.scandir(output_path):
+                number, extension = os.path.splitext(entry.name)
+                if extension == ".json" and self.status(number) != OK:
+                    entries.append({"number": number, "status": OK, "topic": topic, "fetched_at": now})
+        if entries:
+            self._append(entries)
+        return len(entries)
+
+    def compact(self):
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            if hasattr(self, "_log"):
+                self._log.close()
+                self._log = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._log.close()
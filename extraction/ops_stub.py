@@ -0,0 +1,338 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+
+EXCHANGE_NS = "http://www.epo.org/exchange"
+OPS_NS = "http://ops.epo.org"
+SERVICE_LIMITS = {"images": 200, "inpadoc": 60, "other": 1000, "retrieval": 200, "search": 30}
+BIBLIO_RE = re.compile(r"^/3\.2/rest-services/published-data/publication/epodoc/([^/]+)/biblio$")
+PD_RE = re.compile(r'\s*and\s+pd\s+within\s+"(\d{8})\s+(\d{8})"\s*$')
+
+ET.register_namespace("", EXCHANGE_NS)
+ET.register_namespace("ops", OPS_NS)
+
+
+def dict_to_xml(parent, tag, value):
+    if isinstance(value, list):
+        for item in value:
+            dict_to_xml(parent, tag, item)
+        return
+    element = ET.SubElement(parent, f"{{{EXCHANGE_NS}}}{tag}")
+    if isinstance(value, dict):
+        for child_tag, child_value in value.items():
+            dict_to_xml(element, child_tag, child_value)
+    else:
+        element.text = value
+
+
+def biblio_from_json(data):
+    root = ET.Element(f"{{{OPS_NS}}}world-patent-data")
+    exchange_documents = data.get("exchange-documents", {}).get("exchange-document", [])
+    container = ET.SubElement(root, f"{{{EXCHANGE_NS}}}exchange-documents")
+    for document in exchange_documents if isinstance(exchange_documents, list) else [exchange_documents]:
+        dict_to_xml(container, "exchange-document", document)
+        element = container[-1]
+        doc_ids = document.get("bibliographic-data", {}).get("publication-reference", {}).get("document-id", [])
+        doc_id = doc_ids[0] if isinstance(doc_ids, list) and doc_ids else doc_ids
+        if isinstance(doc_id, dict):
+            element.set("country", doc_id.get("country") or "")
+            element.set("doc-number", doc_id.get("doc-number") or "")
+            element.set("kind", doc_id.get("kind") or "")
+    return root
+
+
+class StubState:
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.dates = {}
+        self.searches = {}
+        self.tokens = {}
+        self.windows = {service: deque() for service in SERVICE_LIMITS}
+        self.counts = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        if args.seed_biblio:
+            self.load_biblio(args.seed_biblio)
+        if args.seed_search:
+            self.load_searches(args.seed_search)
+
+    def load_biblio(self, path):
+        for file in glob.glob(os.path.join(path, "*", "*.json")):
+            number = os.path.splitext(os.path.basename(file))[0]
+            self.documents[number] = file
+        print(f"{len(self.documents)} documentos de biblio cargados de {path}")
+
+    def load_searches(self, path):
+        for file in glob.glob(os.path.join(path, "*.json")):
+            keyword = re.sub(r"(_\d+_\d+)?\.json$", "", os.path.basename(file))
+            with open(file, "r") as f:
+                self.searches.setdefault(keyword, []).extend(json.load(f))
+        print(f"{len(self.searches)} búsquedas cargadas de {path}")
+
+    def publication_date(self, publication):
+        doc_id = publication["document-id"]
+        number = f"{doc_id['country']['$']}{doc_id['doc-number']['$']}"
+        if number not in self.dates:
+            digest = int(hashlib.sha1(number.encode()).hexdigest(), 16)
+            self.dates[number] = f"{1990 + digest % 35}{1 + digest // 35 % 12:02d}{1 + digest // 420 % 28:02d}"
+        return self.dates[number]
+
+    def biblio_xml(self, number):
+        fixture = self.fixture_path("GET", f"/3.2/rest-services/published-data/publication/epodoc/{number}/biblio", "")
+        if fixture and os.path.exists(fixture):
+            with open(fixture, "rb") as f:
+                return ET.fromstring(f.read())
+        if number not in self.documents:
+            return None
+        with open(self.documents[number], "r") as f:
+            return biblio_from_json(json.load(f))
+
+    def fixture_path(self, method, path, body):
+        if not self.args.fixtures:
+            return None
+        key = hashlib.sha1(f"{method} {path} {body}".encode()).hexdigest()
+        return os.path.join(self.args.fixtures, f"{key}.bin")
+
+    def admit(self, service):
+        limit = SERVICE_LIMITS[service] if self.args.enforce_limits else None
+        with self.lock:
+            self.counts[f"requests:{service}"] += 1
+            window = self.windows[service]
+            now = time.monotonic()
+            while window and now - window[0] > 60:
+                window.popleft()
+            window.append(now)
+            used = len(window)
+        color = self.args.color
+        if limit:
+            if used > limit:
+                color = "black"
+            elif used > 0.9 * limit:
+                color = "red"
+            elif used > 0.7 * limit:
+                color = "yellow"
+        return color, used, limit
+
+    def throttling_header(self, service, color):
+        lights = ", ".join(
+            f"{name}={color if name == service else self.args.color}:{limit}"
+            for name, limit in sorted(SERVICE_LIMITS.items())
+        )
+        return f"{self.args.system_state} ({lights})"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "OPSStub/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.state.args.verbose:
+            super().log_message(format, *args)
+
+    def send(self, status, body=b"", content_type="application/xml", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.state.lock:
+            self.server.state.counts[f"status:{status}"] += 1
+            self.server.state.counts["response_bytes"] += len(body)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode("utf-8") if length else ""
+
+    def authorized(self):
+        token = (self.headers.get("Authorization") or "").replace("Bearer ", "")
+        expires = self.server.state.tokens.get(token)
+        return expires is not None and expires > time.monotonic()
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def handle_request(self, method):
+        state = self.server.state
+        args = state.args
+        url = urlsplit(self.path)
+        body = self.read_body()
+        with state.lock:
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            if url.path == "/stub/stats":
+                with state.lock:
+                    stats = dict(state.counts, in_flight=state.in_flight, max_in_flight=state.max_in_flight)
+                return self.send(200, json.dumps(stats, indent=4), "application/json")
+            if args.latency:
+                time.sleep(max(0.0, state.random.gauss(args.latency, args.jitter)))
+            if url.path == "/3.2/auth/accesstoken":
+                token = uuid.uuid4().hex
+                state.tokens[token] = time.monotonic() + args.token_ttl
+                return self.send(200, json.dumps({"access_token": token, "expires_in": str(args.token_ttl)}),
+                                 "application/json")
+            if not self.authorized():
+                return self.send(401, "<fault><code>CLIENT.InvalidAccessToken</code></fault>")
+            service = "search" if url.path.endswith("/search") else "other" if "/developers/" in url.path else "retrieval"
+            color, used, limit = state.admit(service)
+            headers = {"X-Throttling-Control": state.throttling_header(service, color),
+                       "X-IndividualQuotaPerHour-Used": str(used * 1000)}
+            if state.random.random() < args.error_rate:
+                return self.send(503, "<fault><code>SERVER.DomainAccess</code></fault>", headers=headers)
+            if color == "black" or state.random.random() < args.throttle_rate:
+                headers["Retry-After"] = str(args.retry_after)
+                headers["X-Rejection-Reason"] = "IndividualQuotaPerHour"
+                return self.send(403, "<fault><code>CLIENT.RobotDetected</code></fault>", headers=headers)
+            fixture = state.fixture_path(method, self.path, body)
+            if fixture and os.path.exists(fixture):
+                with open(fixture, "rb") as f:
+                    return self.send(200, f.read(), self.fixture_type(fixture), headers)
+            if args.record:
+                return self.proxy(method, body, fixture, headers)
+            if url.path == "/3.2/rest-services/published-data/search":
+                return self.search(parse_qs(url.query), headers)
+            if url.path == "/3.2/rest-services/published-data/publication/epodoc/biblio" and method == "POST":
+                return self.bulk_biblio(body, headers)
+            match = BIBLIO_RE.match(url.path)
+            if match:
+                root = state.biblio_xml(match.group(1))
+                if root is None:
+                    return self.send(404, "<fault><code>SERVER.EntityNotFound</code></fault>", headers=headers)
+                return self.send(200, ET.tostring(root, xml_declaration=True, encoding="utf-8"), headers=headers)
+            if url.path == "/3.2/developers/me/stats/usage":
+                return self.usage(headers)
+            return self.send(404, "<fault><code>SERVER.EntityNotFound</code></fault>", headers=headers)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def fixture_type(self, fixture):
+        meta = fixture + ".json"
+        if os.path.exists(meta):
+            with open(meta, "r") as f:
+                return json.load(f).get("content_type", "application/xml")
+        return "application/xml"
+
+    def proxy(self, method, body, fixture, headers):
+        upstream = self.server.state.args.record.rstrip("/") + self.path.replace("/3.2", "", 1)
+        forward = {name: value for name, value in self.headers.items() if name.lower() in ("accept", "content-type")}
+        forward["Authorization"] = f"Bearer {self.server.state.args.upstream_token}"
+        response = requests.request(method, upstream, headers=forward, data=body or None)
+        if response.status_code == 200 and fixture:
+            os.makedirs(os.path.dirname(fixture), exist_ok=True)
+            with open(fixture, "wb") as f:
+                f.write(response.content)
+            with open(fixture + ".json", "w") as f:
+                json.dump({"method": method, "path": self.path, "content_type": response.headers.get("Content-Type")}, f)
+        headers["X-Throttling-Control"] = response.headers.get("X-Throttling-Control", headers["X-Throttling-Control"])
+        return self.send(response.status_code, response.content, response.headers.get("Content-Type", "application/xml"), headers)
+
+    def search(self, params, headers):
+        state = self.server.state
+        query = params.get("q", [""])[0]
+        start, end = (int(value) for value in params.get("range", ["1-25"])[0].split("-"))
+        match = PD_RE.search(query)
+        keyword = PD_RE.sub("", query).strip()
+        if keyword.startswith("(") and keyword.endswith(")"):
+            keyword = keyword[1:-1]
+        publications = state.searches.get(keyword, [])
+        if match:
+            low, high = match.groups()
+            publications = [p for p in publications if low <= state.publication_date(p) <= high]
+        if not publications:
+            return self.send(404, "<fault><code>SERVER.EntityNotFound</code></fault>", headers=headers)
+        data = {"ops:world-patent-data": {"ops:biblio-search": {
+            "@total-result-count": str(len(publications)),
+            "ops:query": {"$": query},
+            "ops:range": {"@begin": str(start), "@end": str(end)},
+            "ops:search-result": {"ops:publication-reference": publications[start - 1:min(end, 2000)]},
+        }}}
+        return self.send(200, json.dumps(data), "application/json", headers)
+
+    def bulk_biblio(self, body, headers):
+        state = self.server.state
+        numbers = [number.strip() for number in re.split(r"[\n,]", body) if number.strip()]
+        root = ET.Element(f"{{{OPS_NS}}}world-patent-data")
+        container = ET.SubElement(root, f"{{{EXCHANGE_NS}}}exchange-documents")
+        for number in numbers[:100]:
+            document = state.biblio_xml(number)
+            if document is not None:
+                for exchange_documents in document:
+                    container.extend(list(exchange_documents))
+        if not len(container):
+            return self.send(404, "<fault><code>SERVER.EntityNotFound</code></fault>", headers=headers)
+        return self.send(200, ET.tostring(root, xml_declaration=True, encoding="utf-8"), headers=headers)
+
+    def usage(self, headers):
+        with self.server.state.lock:
+            counts = dict(self.server.state.counts)
+        day = int(time.time() // 86400 * 86400 * 1000)
+        metrics = [
+            {"name": "message_count", "values": [{"timestamp": day, "value": str(float(sum(
+                counts.get(f"requests:{name}", 0) for name in SERVICE_LIMITS)))}]},
+            {"name": "total_response_size", "values": [{"timestamp": day, "value": str(float(
+                counts.get("response_bytes", 0)))}]},
+        ]
+        body = json.dumps({"environments": [{"name": "prod", "dimensions": [{"name": "stub", "metrics": metrics}]}]})
+        return self.send(200, body, content_type="application/json", headers=headers)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita OPS para pruebas de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--seed-biblio", default="biblio_output")
+    parser.add_argument("--seed-search", default="search_patents")
+    parser.add_argument("--fixtures", default=None, help="directorio de respuestas grabadas")
+    parser.add_argument("--record", default=None, help="URL de OPS a la que reenviar y grabar respuestas")
+    parser.add_argument("--upstream-token", default=os.getenv("OPS_UPSTREAM_TOKEN"))
+    parser.add_argument("--latency", type=float, default=0.0, help="latencia media en segundos")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fracción de respuestas 403 con Retry-After")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--color", default="green", choices=["green", "yellow", "red", "black"])
+    parser.add_argument("--system-state", default="idle", choices=["idle", "busy", "overloaded"])
+    parser.add_argument("--enforce-limits", action="store_true", help="aplicar los límites por minuto de cada servicio")
+    parser.add_argument("--token-ttl", type=int, default=1199)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def make_server(args):
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(args)
+    return server
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = make_server(args)
+    print(f"OPS simulado en http://{args.host}:{server.server_port}/3.2 (OPS_BASE_URL)")
+    server.serve_forever()
@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+
+import extraction.xml_records as xr
+
+
+UNAVAILABLE = "Unavailable information"
+COUNTRY_CODES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "country_codes.json")
+LIST_FIELDS = ("inventor_names", "applicant_names", "citations")
+
+with open(COUNTRY_CODES_PATH, "r", encoding="utf-8") as f:
+    country_codes = json.load(f)
+
+
+def country_name(country_code):
+    return country_codes.get(country_code, UNAVAILABLE)
+
+
+def parse_year(date):
+    try:
+        return int(date[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def intern_all(values):
+    return tuple(sys.intern(value) for value in values)
+
+
+class PatentRecord:
+    __slots__ = (
+        "patent_number", "country_code", "year", "invention_title", "abstract",
+        "inventor_names", "applicant_names", "citations", "topic",
+    )
+
+    def __init__(self, patent_number, country_code=None, year=None, invention_title=UNAVAILABLE,
+                 abstract=UNAVAILABLE, inventor_names=(), applicant_names=(), citations=(), topic=None):
+        self.patent_number = sys.intern(patent_number)
+        self.country_code = sys.intern(country_code) if country_code else None
+        self.year = year
+        self.invention_title = invention_title
+        self.abstract = abstract
+        self.inventor_names = intern_all(inventor_names)
+        self.applicant_names = intern_all(applicant_names)
+        self.citations = intern_all(citations)
+        self.topic = sys.intern(topic) if topic else None
+
+    @classmethod
+    def from_record(cls, record, topic=None):
+        return cls(
+            record["patent_number"],
+            record["country"],
+            parse_year(record["date"]),
+            xr.select_text(record["titles"], UNAVAILABLE),
+            xr.select_text(record["abstracts"], UNAVAILABLE),
+            record["inventors"],
+            record["applicants"],
+            xr.citation_keys(record),
+            topic,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            row["patent_number"],
+            row["country_code"],
+            parse_year(row["date"]),
+            row["invention_title"] or UNAVAILABLE,
+            row["abstract"] or UNAVAILABLE,
+            row["inventor_names"],
+            row["applicant_names"],
+            row["citations"],
+            row["topic"],
+        )
+
+    @property
+    def country(self):
+        return country_name(self.country_code)
+
+    @property
+    def year_text(self):
+        return str(self.year) if self.year is not None else UNAVAILABLE
+
+    def __getitem__(self, key):
+        if key == "year":
+            return self.year_text
+        if key == "country":
+            return self.country
+        if key in LIST_FIELDS:
+            return list(getattr(self, key))
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        return {key: self[key] for key in ("patent_number", "invention_title", "inventor_names", "applicant_names",
+                                           "year", "country", "abstract", "citations", "topic")}
+
+    def __repr__(self):
+        return f"PatentRecord({self.patent_number!r}, {self.country_code!r}, {self.year!r})"
+
+
+def records_from_json(data, patent_number, topic=None):
+    return [PatentRecord.from_record(record, topic) for record in xr.records_from_json(data, patent_number)]
+
+
+def load_records(file_path):
+    patent_number = os.path.splitext(os.path.basename(file_path))[0]
+    topic = os.path.basename(os.path.dirname(file_path))
+    with open(file_path, "r", encoding="utf-8") as f:
+        return records_from_json(json.load(f), patent_number, topic)
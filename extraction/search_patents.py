@@ -1,24 +1,36 @@
-import requests
-import json
-import time
+import argparse
 import os
-import xml.etree.ElementTree as ET
-import utils
+import sys
+
+sys.path.append('..')
+
+import extraction.sharded_search as sharded_search
+from extraction.client import OPSClient
 from dotenv import load_dotenv
 
 load_dotenv()
 CLIENT_KEY = os.getenv("CLIENT_KEY")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+SEARCH_WORKERS = int(os.getenv("OPS_SEARCH_WORKERS", "4"))
+
+parser = argparse.ArgumentParser(description="Busca las publicaciones de cada palabra clave en OPS")
+parser.add_argument("--reset", action="store_true", help="descarta los fragmentos y páginas de una ejecución interrumpida")
+args = parser.parse_args()
+
 output_path = "search_patents"   
 os.makedirs(output_path, exist_ok=True)
 
-keywords = ['Low Carbon Hydrogen', 'Energy Hydrogen']
-ranges = ['1-2000', '2001-4000', '4001-6000', '6001-8000', '8001-10000']
+keywords = ['"Low Carbon Hydrogen"', '"Energy Hydrogen"']
 
 
-access_token = utils.get_access_token(CLIENT_KEY, CLIENT_SECRET)
-if access_token:
+client = OPSClient(CLIENT_KEY, CLIENT_SECRET, pool_size=SEARCH_WORKERS)
+if client.tokens.get():
+    incomplete = []
     for keyword in keywords:
-        search_results = utils.search_patents(access_token, keyword, 2001, 100, 4000)
-        with open(os.path.join(output_path, f"{keyword}_2001_4000.json"), "w") as f:
-            json.dump(search_results, f, indent=4, ensure_ascii=False)
+        search_results = sharded_search.run_search(client, keyword, output_path, SEARCH_WORKERS, reset=args.reset)
+        if search_results is None:
+            incomplete.append(keyword)
+            continue
+        print(f"{keyword}: {len(search_results)} publicaciones guardadas en {output_path}/{keyword}.json")
+    if incomplete:
+        sys.exit(f"Búsqueda incompleta para {', '.join(incomplete)}; los resultados parciales quedan en *.json.partial")
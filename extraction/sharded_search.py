@@ -0,0 +1,124 @@
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import extraction.utils as eu
+from extraction.fetcher import publication_number
+
+
+FIRST_DATE = date(1900, 1, 1)
+
+
+def keyword_slug(keyword):
+    return re.sub(r'[^A-Za-z0-9]+', '_', keyword).strip('_')
+
+
+def shard_query(keyword, start_date, end_date):
+    if start_date is None:
+        return keyword
+    return f'({keyword}) and pd within "{start_date:%Y%m%d} {end_date:%Y%m%d}"'
+
+
+def write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def plan_shards(client, keyword, start_date, end_date, cap=eu.SEARCH_MAX_RESULTS):
+    total, _ = eu.search_page(client, shard_query(keyword, start_date, end_date), 1, 1)
+    if total <= cap or start_date >= end_date:
+        if total > cap:
+            print(f"Aviso: {total} resultados el {start_date}, solo se alcanzan {cap}")
+        return [{"start": start_date.isoformat(), "end": end_date.isoformat(), "total": total}] if total else []
+    middle = start_date + timedelta(days=(end_date - start_date).days // 2)
+    return (plan_shards(client, keyword, start_date, middle, cap)
+            + plan_shards(client, keyword, middle + timedelta(days=1), end_date, cap))
+
+
+def load_plan(client, keyword, manifest_path, cap):
+    plan_path = os.path.join(manifest_path, "shards.json")
+    if os.path.exists(plan_path):
+        with open(plan_path, "r") as f:
+            return json.load(f)
+    total, _ = eu.search_page(client, keyword, 1, 1)
+    if total <= cap:
+        shards = [{"start": None, "end": None, "total": total}] if total else []
+    else:
+        print(f"{keyword}: {total} resultados, dividiendo por fecha de publicación")
+        shards = plan_shards(client, keyword, FIRST_DATE, date.today(), cap)
+    write_json(plan_path, shards)
+    return shards
+
+
+def shard_pages(shards, cap, page_size):
+    for index, shard in enumerate(shards):
+        for start in range(1, min(shard["total"], cap) + 1, page_size):
+            end = min(start + page_size - 1, shard["total"], cap)
+            yield index, shard, start, end
+
+
+def page_path(manifest_path, index, start, end):
+    return os.path.join(manifest_path, f"{index:04d}_{start}-{end}.json")
+
+
+def fetch_page(client, keyword, manifest_path, index, shard, start, end):
+    start_date = date.fromisoformat(shard["start"]) if shard["start"] else None
+    end_date = date.fromisoformat(shard["end"]) if shard["end"] else None
+    _, publications = eu.search_page(client, shard_query(keyword, start_date, end_date), start, end)
+    write_json(page_path(manifest_path, index, start, end), publications)
+    return len(publications)
+
+
+def reset_manifest(manifest_path):
+    if os.path.isdir(manifest_path):
+        shutil.rmtree(manifest_path)
+
+
+def run_search(client, keyword, output_path, workers=4, cap=eu.SEARCH_MAX_RESULTS, page_size=eu.SEARCH_PAGE_SIZE,
+               reset=False):
+    manifest_path = os.path.join(output_path, "manifests", keyword_slug(keyword))
+    if reset:
+        reset_manifest(manifest_path)
+    os.makedirs(manifest_path, exist_ok=True)
+    shards = load_plan(client, keyword, manifest_path, cap)
+    pages = list(shard_pages(shards, cap, page_size))
+    pending = [page for page in pages if not os.path.exists(page_path(manifest_path, page[0], page[2], page[3]))]
+    print(f"{keyword}: {len(shards)} fragmentos, {len(pages)} páginas, {len(pending)} pendientes")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_page, client, keyword, manifest_path, *page): page for page in pending}
+        for future in as_completed(futures):
+            index, _, start, end = futures[future]
+            try:
+                print(f"Página {index}:{start}-{end} guardada ({future.result()} resultados)")
+            except Exception as e:
+                print(f"Error en la página {index}:{start}-{end}: {e}")
+
+    publications = {}
+    missing = 0
+    for index, _, start, end in pages:
+        path = page_path(manifest_path, index, start, end)
+        if not os.path.exists(path):
+            missing += 1
+            continue
+        with open(path, "r") as f:
+            for doc in json.load(f):
+                publications.setdefault(publication_number(doc), doc)
+    results = list(publications.values())
+    result_path = os.path.join(output_path, f"{keyword}.json")
+    if missing:
+        # Keep an incomplete merge out of <keyword>.json so biblio.py never fetches a partial list
+        write_json(result_path + '.partial', results)
+        print(f"{keyword}: faltan {missing} páginas, vuelva a ejecutar para reanudar")
+        return None
+    write_json(result_path, results)
+    if os.path.exists(result_path + '.partial'):
+        os.remove(result_path + '.partial')
+    # The checkpoint only serves to resume an interrupted run; once the merged file is
+    # complete the next run plans the shards again with up-to-date totals
+    reset_manifest(manifest_path)
+    return results
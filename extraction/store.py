@@ -0,0 +1,198 @@
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+
+sys.path.append('..')
+
+import extraction.xml_records as xr
+
+
+STORE_NAME = "patents.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payloads (
+    patent_number TEXT PRIMARY KEY,
+    topic TEXT,
+    format TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patents (
+    id INTEGER PRIMARY KEY,
+    patent_number TEXT NOT NULL,
+    doc_index INTEGER NOT NULL,
+    topic TEXT,
+    country TEXT,
+    doc_number TEXT,
+    kind TEXT,
+    family_id TEXT,
+    date TEXT,
+    title TEXT,
+    abstract TEXT,
+    titles TEXT,
+    abstracts TEXT,
+    UNIQUE (patent_number, doc_index)
+);
+CREATE INDEX IF NOT EXISTS patents_topic ON patents (topic);
+CREATE TABLE IF NOT EXISTS citations (
+    patent_id INTEGER NOT NULL REFERENCES patents (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    cited TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS citations_patent ON citations (patent_id);
+CREATE INDEX IF NOT EXISTS citations_cited ON citations (cited);
+CREATE TABLE IF NOT EXISTS inventors (
+    patent_id INTEGER NOT NULL REFERENCES patents (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inventors_patent ON inventors (patent_id);
+CREATE TABLE IF NOT EXISTS applicants (
+    patent_id INTEGER NOT NULL REFERENCES patents (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS applicants_patent ON applicants (patent_id);
+"""
+
+
+def store_path(path):
+    return path if path.endswith(".db") else os.path.join(path, STORE_NAME)
+
+
+class PatentStore:
+    def __init__(self, path, readonly=False):
+        self.path = store_path(path)
+        self._lock = threading.Lock()
+        if readonly:
+            self.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+    def add_records(self, patent_number, topic, records, payload=None, payload_format=None):
+        with self._lock, self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute("DELETE FROM patents WHERE patent_number = ?", (patent_number,))
+            if payload is not None:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO payloads VALUES (?, ?, ?, ?)",
+                    (patent_number, topic, payload_format, zlib.compress(payload, 6)),
+                )
+            for doc_index, record in enumerate(records):
+                cursor.execute(
+                    "INSERT INTO patents (patent_number, doc_index, topic, country, doc_number, kind, family_id, date,"
+                    " title, abstract, titles, abstracts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        patent_number, doc_index, topic, record["country"], record["doc_number"], record["kind"],
+                        record["family_id"], record["date"], xr.select_text(record["titles"]),
+                        xr.select_text(record["abstracts"]), json.dumps(record["titles"], ensure_ascii=False),
+                        json.dumps(record["abstracts"], ensure_ascii=False),
+                    ),
+                )
+                patent_id = cursor.lastrowid
+                cursor.executemany(
+                    "INSERT INTO citations VALUES (?, ?, 'patcit', ?)",
+                    [(patent_id, i, cited) for i, cited in enumerate(xr.citation_keys(record))],
+                )
+                cursor.executemany(
+                    "INSERT INTO citations VALUES (?, ?, 'nplcit', ?)",
+                    [(patent_id, i, text) for i, text in enumerate(record["nplcit"])],
+                )
+                cursor.executemany(
+                    "INSERT INTO inventors VALUES (?, ?, ?)",
+                    [(patent_id, i, name) for i, name in enumerate(record["inventors"])],
+                )
+                cursor.executemany(
+                    "INSERT INTO applicants VALUES (?, ?, ?)",
+                    [(patent_id, i, name) for i, name in enumerate(record["applicants"])],
+                )
+
+    def add_xml(self, patent_number, topic, content):
+        records = xr.parse_biblio(content, patent_number)
+        self.add_records(patent_number, topic, records, content, "xml")
+
+    def add_json(self, patent_number, topic, data):
+        records = xr.records_from_json(data, patent_number)
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.add_records(patent_number, topic, records, payload, "json")
+
+    def import_json_dir(self, path, skip_existing=True):
+        known = self.patent_numbers() if skip_existing else set()
+        count = 0
+        for file in glob.glob(path + '/*/*.json'):
+            patent_number = os.path.splitext(os.path.basename(file))[0]
+            if patent_number in known:
+                continue
+            topic = os.path.basename(os.path.dirname(file))
+            try:
+                with open(file, 'r', encoding='utf-8') as f:
+                    self.add_json(patent_number, topic, json.load(f))
+                count += 1
+            except (ValueError, AttributeError) as e:
+                print(f"Error en el archivo {file}: {e}")
+        return count
+
+    def patent_numbers(self):
+        with self._lock:
+            return {row[0] for row in self.connection.execute("SELECT DISTINCT patent_number FROM patents")}
+
+    def payload(self, patent_number):
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT format, data FROM payloads WHERE patent_number = ?", (patent_number,)
+            ).fetchone()
+        if row is None:
+            return None
+        payload_format, data = row
+        data = zlib.decompress(data)
+        return json.loads(data) if payload_format == "json" else data
+
+    def _children(self, table, column, where=""):
+        children = {}
+        query = f"SELECT patent_id, {column} FROM {table} {where} ORDER BY patent_id, position"
+        for patent_id, value in self.connection.execute(query):
+            children.setdefault(patent_id, []).append(value)
+        return children
+
+    def iter_patents(self, topic=None):
+        with self._lock:
+            citations = self._children("citations", "cited", "WHERE kind = 'patcit'")
+            inventors = self._children("inventors", "name")
+            applicants = self._children("applicants", "name")
+            query = "SELECT id, patent_number, topic, country, date, title, abstract FROM patents"
+            params = ()
+            if topic:
+                query += " WHERE topic = ?"
+                params = (topic,)
+            rows = self.connection.execute(query + " ORDER BY id", params).fetchall()
+        for patent_id, patent_number, row_topic, country, date, title, abstract in rows:
+            yield {
+                "patent_number": patent_number,
+                "topic": row_topic,
+                "country_code": country,
+                "date": date,
+                "invention_title": title,
+                "abstract": abstract,
+                "citations": citations.get(patent_id, []),
+                "inventor_names": inventors.get(patent_id, []),
+                "applicant_names": applicants.get(patent_id, []),
+            }
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "biblio_output"
+    store = PatentStore(path)
+    print(f"{store.import_json_dir(path)} documentos importados en {store.path}")
+    store.close()
@@ -0,0 +1,201 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from extraction.throttle import THROTTLING_HEADER, parse_throttling_header
+
+
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics", "ops_metrics.jsonl")
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FLUSH_INTERVAL = 60
+
+
+def service_for_url(url):
+    path = urlsplit(url).path
+    if path.endswith("/auth/accesstoken"):
+        return "auth"
+    if path.endswith("/published-data/search"):
+        return "search"
+    if "/developers/" in path:
+        return "other"
+    return "retrieval"
+
+
+def utc_day(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+
+class ServiceMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.status = Counter()
+        self.throttle = Counter()
+
+    def observe(self, status, latency, bytes_in, bytes_out, color):
+        self.requests += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_buckets[i] += 1
+                break
+        else:
+            self.latency_buckets[-1] += 1
+        self.status[str(status)] += 1
+        if color:
+            self.throttle[color] += 1
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "latency_sum": self.latency_sum,
+            "latency_buckets": list(self.latency_buckets),
+            "status": dict(self.status),
+            "throttle": dict(self.throttle),
+        }
+
+
+class Metrics:
+    def __init__(self, path=None):
+        self.path = path
+        self.started = time.time()
+        self.services = defaultdict(ServiceMetrics)
+        self.pending = defaultdict(lambda: defaultdict(ServiceMetrics))
+        self.last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = None
+        if path:
+            atexit.register(self.flush)
+
+    def observe(self, service, status, latency, bytes_in, bytes_out, color=None):
+        with self._lock:
+            self.services[service].observe(status, latency, bytes_in, bytes_out, color)
+            self.pending[utc_day(time.time())][service].observe(status, latency, bytes_in, bytes_out, color)
+            flush = self.path and time.monotonic() - self.last_flush > FLUSH_INTERVAL
+        if flush:
+            self.flush()
+
+    def response_hook(self, response, *args, **kwargs):
+        service = service_for_url(response.url)
+        body = response.request.body or b""
+        _, lights = parse_throttling_header(response.headers.get(THROTTLING_HEADER))
+        color = lights.get(service, (None, None))[0]
+        self.observe(
+            service,
+            response.status_code,
+            response.elapsed.total_seconds(),
+            len(response.content or b""),
+            len(body.encode("utf-8") if isinstance(body, str) else body),
+            color,
+        )
+
+    def flush(self):
+        with self._lock:
+            pending, self.pending = self.pending, defaultdict(lambda: defaultdict(ServiceMetrics))
+            self.last_flush = time.monotonic()
+        if not self.path or not pending:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lines = "".join(
+            json.dumps({"day": day, "service": service, "recorded_at": time.time(), **metrics.to_dict()}) + "\n"
+            for day, services in pending.items()
+            for service, metrics in services.items()
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def request_count(self, service):
+        with self._lock:
+            return self.services[service].requests if service in self.services else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {service: metrics.to_dict() for service, metrics in self.services.items()}
+
+    def to_prometheus(self):
+        families = {
+            "ops_requests_total": ("counter", []),
+            "ops_response_bytes_total": ("counter", []),
+            "ops_request_bytes_total": ("counter", []),
+            "ops_responses_total": ("counter", []),
+            "ops_throttle_state_total": ("counter", []),
+            "ops_request_latency_seconds": ("histogram", []),
+        }
+        for service, metrics in sorted(self.snapshot().items()):
+            label = f'service="{service}"'
+            families["ops_requests_total"][1].append(f"ops_requests_total{{{label}}} {metrics['requests']}")
+            families["ops_response_bytes_total"][1].append(f"ops_response_bytes_total{{{label}}} {metrics['bytes_in']}")
+            families["ops_request_bytes_total"][1].append(f"ops_request_bytes_total{{{label}}} {metrics['bytes_out']}")
+            for status, count in sorted(metrics["status"].items()):
+                families["ops_responses_total"][1].append(f'ops_responses_total{{{label},status="{status}"}} {count}')
+            for color, count in sorted(metrics["throttle"].items()):
+                families["ops_throttle_state_total"][1].append(
+                    f'ops_throttle_state_total{{{label},color="{color}"}} {count}')
+            histogram = families["ops_request_latency_seconds"][1]
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), metrics["latency_buckets"]):
+                cumulative += count
+                histogram.append(f'ops_request_latency_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            histogram.append(f"ops_request_latency_seconds_sum{{{label}}} {metrics['latency_sum']}")
+            histogram.append(f"ops_request_latency_seconds_count{{{label}}} {metrics['requests']}")
+        # The exposition format wants each family's samples right after its TYPE line
+        lines = []
+        for name, (kind, samples) in families.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_port
+
+    def close(self):
+        self.flush()
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+
+def load_daily(path=METRICS_PATH, start_day=None, end_day=None):
+    totals = defaultdict(lambda: defaultdict(Counter))
+    if not os.path.exists(path):
+        return totals
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            day = entry["day"]
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            totals[day][entry["service"]].update(requests=entry["requests"], bytes_in=entry["bytes_in"])
+    return totals
@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+
+
+THROTTLING_HEADER = "X-Throttling-Control"
+REJECTION_HEADER = "X-Rejection-Reason"
+QUOTA_HEADERS = {
+    "hour_used": "X-IndividualQuotaPerHour-Used",
+    "week_used": "X-RegisteredQuotaPerWeek-Used",
+}
+RETRY_STATUS = {403, 429, 500, 502, 503, 504}
+FATAL_REJECTIONS = {"RegisteredQuotaPerWeek", "AnonymousQuotaPerDay"}
+
+_system_re = re.compile(r"^\s*([a-z]+)")
+_service_re = re.compile(r"([a-z]+)=([a-z]+):(\d+)")
+
+
+def parse_throttling_header(value):
+    if not value:
+        return None, {}
+    system = _system_re.match(value)
+    services = {name: (color, int(limit)) for name, color, limit in _service_re.findall(value)}
+    return (system.group(1) if system else None), services
+
+
+class ServiceState:
+    def __init__(self, rate):
+        self.rate = rate
+        self.limit = None
+        self.color = None
+        self.next_time = 0.0
+        self.paused_until = 0.0
+        self.requests = 0
+        self.retries = 0
+
+
+class ThrottleController:
+    def __init__(self, initial_rate=30, min_rate=1, increase=5, yellow_factor=0.75, red_factor=0.5,
+                 black_pause=60, max_retries=5, backoff=2.0, max_backoff=120):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.yellow_factor = yellow_factor
+        self.red_factor = red_factor
+        self.black_pause = black_pause
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.system_state = None
+        self.quota = {}
+        self.services = {}
+        self._lock = threading.Lock()
+
+    def _service(self, service):
+        if service not in self.services:
+            self.services[service] = ServiceState(self.initial_rate)
+        return self.services[service]
+
+    def wait(self, service):
+        with self._lock:
+            state = self._service(service)
+            now = time.monotonic()
+            start = max(now, state.next_time, state.paused_until)
+            state.next_time = start + 60.0 / state.rate
+            state.requests += 1
+        if start > now:
+            time.sleep(start - now)
+
+    def pause(self, service, seconds):
+        with self._lock:
+            state = self._service(service)
+            state.paused_until = max(state.paused_until, time.monotonic() + seconds)
+
+    def update(self, service, response):
+        system, lights = parse_throttling_header(response.headers.get(THROTTLING_HEADER))
+        with self._lock:
+            for key, header in QUOTA_HEADERS.items():
+                if header in response.headers:
+                    self.quota[key] = int(response.headers[header])
+            if system:
+                self.system_state = system
+            state = self._service(service)
+            if service not in lights:
+                return
+            color, limit = lights[service]
+            state.color = color
+            state.limit = limit
+            if color == "green" and system != "overloaded":
+                state.rate = min(limit, state.rate + self.increase)
+            elif color == "yellow" or (color == "green" and system == "overloaded"):
+                state.rate = max(self.min_rate, state.rate * self.yellow_factor)
+            elif color == "red":
+                state.rate = max(self.min_rate, state.rate * self.red_factor)
+            elif color == "black":
+                state.rate = self.min_rate
+                state.paused_until = max(state.paused_until, time.monotonic() + self.black_pause)
+            if limit:
+                state.rate = min(state.rate, limit)
+
+    def retry_delay(self, response, attempt):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(self.max_backoff, self.backoff ** attempt)
+
+    def request(self, session, method, url, service, **kwargs):
+        attempt = 0
+        while True:
+            self.wait(service)
+            response = session.request(method, url, **kwargs)
+            self.update(service, response)
+            if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                return response
+            rejection = response.headers.get(REJECTION_HEADER)
+            if response.status_code == 403 and not rejection:
+                return response
+            if rejection in FATAL_REJECTIONS:
+                print(f"Cuota agotada ({rejection}), no se reintenta")
+                return response
+            attempt += 1
+            delay = self.retry_delay(response, attempt)
+            with self._lock:
+                self._service(service).retries += 1
+            print(f"Respuesta {response.status_code} de {service}, reintentando en {delay:.1f}s")
+            self.pause(service, delay)
+
+    def state(self):
+        with self._lock:
+            return {
+                "system": self.system_state,
+                "quota": dict(self.quota),
+                "services": {
+                    name: {
+                        "rate": state.rate,
+                        "limit": state.limit,
+                        "color": state.color,
+                        "paused_for": max(0.0, state.paused_until - time.monotonic()),
+                        "requests": state.requests,
+                        "retries": state.retries,
+                    }
+                    for name, state in self.services.items()
+                },
+            }
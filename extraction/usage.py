@@ -1,33 +1,88 @@
-import requests
+import argparse
 import os
-import utils
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.append('..')
+
+import extraction.utils as utils
+import extraction.telemetry as telemetry
+from extraction.client import OPSClient
 from dotenv import load_dotenv
 
 load_dotenv()
 CLIENT_KEY = os.getenv("CLIENT_KEY")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 
-def get_patent_usage( token):
-    url = F"https://ops.epo.org/3.2/developers/me/stats/usage?timeRange=22/09/2024~29/09/2024"
+def get_patent_usage(client, start_date, end_date):
+    url = utils.ops_url(f"/developers/me/stats/usage?timeRange={start_date:%d/%m/%Y}~{end_date:%d/%m/%Y}")
     headers = {
-        'Authorization': f'Bearer {token}',
-        'Accept': 'application/exchange+xml',
+        'Accept': 'application/json',
     }
-    response = requests.get(url, headers=headers)
-    
+    response = client.get(url, "other", headers=headers)
+
     if response.status_code == 200:
-        return response.text
+        return response.json()
     elif response.status_code == 404:
         print(f"Error 404: No se encontró usage")
         return None
     else:
         print(f"Error en la consulta de usage ({response.status_code})")
         return None
-    
-
-client_key = "auc2MieBZtPFyIvfHfUjpZnBi9DByAWVcHAVAbsYmnFTvPMA"
-client_secret = "OUA0e0isLJsFyOePGOCDNM3P2MGHa5gqg6bGqgGCJh5Db13HLUjPJxJlc58Qv8QK"
-access_token = utils.get_access_token(CLIENT_KEY, CLIENT_SECRET)
-response = get_patent_usage(access_token)
-if response:
-    print(response)
\ No newline at end of file
+
+
+def usage_by_day(usage):
+    days = defaultdict(dict)
+    for environment in usage.get("environments", []):
+        for dimension in environment.get("dimensions", []):
+            for metric in dimension.get("metrics", []):
+                for value in metric.get("values", []):
+                    day = datetime.fromtimestamp(int(value["timestamp"]) / 1000, timezone.utc).strftime("%Y-%m-%d")
+                    days[day][metric["name"]] = days[day].get(metric["name"], 0) + float(value["value"])
+    return days
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%d/%m/%Y").date()
+
+
+parser = argparse.ArgumentParser(description="Concilia el consumo registrado localmente con la API de uso de OPS")
+parser.add_argument("--from", dest="start_date", type=parse_date, default=date.today() - timedelta(days=6),
+                    help="fecha inicial dd/mm/aaaa (por defecto hace 7 días)")
+parser.add_argument("--to", dest="end_date", type=parse_date, default=date.today(), help="fecha final dd/mm/aaaa")
+parser.add_argument("--metrics", default=os.getenv("OPS_METRICS_PATH", telemetry.METRICS_PATH))
+parser.add_argument("--weekly-quota-gb", type=float, default=4.0)
+args = parser.parse_args()
+
+local = telemetry.load_daily(args.metrics, args.start_date.isoformat(), args.end_date.isoformat())
+client = OPSClient(CLIENT_KEY, CLIENT_SECRET, metrics=telemetry.Metrics())
+usage = get_patent_usage(client, args.start_date, args.end_date)
+remote = usage_by_day(usage) if usage else {}
+
+print(f"{'día':<12}{'peticiones':>12}{'OPS':>10}{'MB locales':>12}{'MB OPS':>10}")
+totals = defaultdict(float)
+day = args.start_date
+while day <= args.end_date:
+    key = day.isoformat()
+    services = {service: counts for service, counts in local.get(key, {}).items() if service != "auth"}
+    requests_local = sum(counts["requests"] for counts in services.values())
+    bytes_local = sum(counts["bytes_in"] for counts in services.values())
+    requests_remote = remote.get(key, {}).get("message_count", 0)
+    bytes_remote = remote.get(key, {}).get("total_response_size", 0)
+    totals["requests_local"] += requests_local
+    totals["requests_remote"] += requests_remote
+    totals["bytes_local"] += bytes_local
+    totals["bytes_remote"] += bytes_remote
+    print(f"{key:<12}{requests_local:>12}{requests_remote:>10.0f}{bytes_local / 1e6:>12.1f}{bytes_remote / 1e6:>10.1f}")
+    day += timedelta(days=1)
+
+print(f"{'total':<12}{totals['requests_local']:>12.0f}{totals['requests_remote']:>10.0f}"
+      f"{totals['bytes_local'] / 1e6:>12.1f}{totals['bytes_remote'] / 1e6:>10.1f}")
+days = (args.end_date - args.start_date).days + 1
+weekly_bytes = max(totals["bytes_local"], totals["bytes_remote"]) * 7 / days
+print(f"Consumo semanal estimado: {weekly_bytes / 1e9:.2f} GB de {args.weekly_quota_gb:.1f} GB "
+      f"({100 * weekly_bytes / (args.weekly_quota_gb * 1e9):.1f}%)")
+for key in sorted(local):
+    for service, counts in sorted(local[key].items()):
+        print(f"  {key} {service}: {counts['requests']} peticiones, {counts['bytes_in'] / 1e6:.1f} MB")
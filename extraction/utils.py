@@ -1,15 +1,20 @@
 import requests
 import base64
-import json
-import time
 import os
 import xml.etree.ElementTree as ET
 
 
-def get_access_token(client_key, client_secret):
+DEFAULT_BASE_URL = "https://ops.epo.org/3.2"
+
+
+def ops_url(path):
+    return os.getenv("OPS_BASE_URL", DEFAULT_BASE_URL).rstrip("/") + path
+
+
+def get_access_token(client_key, client_secret, session=requests):
     credentials = f"{client_key}:{client_secret}"
     encoded_credentials = base64.b64encode(credentials.encode()).decode()
-    url = "https://ops.epo.org/3.2/auth/accesstoken"
+    url = ops_url("/auth/accesstoken")
     headers = {
         "Authorization": f"Basic {encoded_credentials}",
         "Content-Type": "application/x-www-form-urlencoded"
@@ -17,7 +22,7 @@ def get_access_token(client_key, client_secret):
     data = {
         "grant_type": "client_credentials"
     }
-    response = requests.post(url, headers=headers, data=data)
+    response = session.post(url, headers=headers, data=data)
     if response.status_code == 200:
         return response.json()["access_token"]
     else:
@@ -25,48 +30,44 @@ def get_access_token(client_key, client_secret):
         return None
     
 
-def search_patents(access_token, keyword, start=1, batch_size=100, max_results=1000):
-    url = "https://ops.epo.org/3.2/rest-services/published-data/search"
+SEARCH_PAGE_SIZE = 100
+SEARCH_MAX_RESULTS = 2000
+
+
+def search_page(client, query, start, end):
+    url = ops_url("/rest-services/published-data/search")
     headers = {
         "Accept": "application/json",
-        "Authorization": f"Bearer {access_token}"
     }
+    params = {
+        "q": query,
+        "range": f"{start}-{end}"
+    }
+    response = client.get(url, "search", headers=headers, params=params)
+    if response.status_code == 404:
+        return 0, []
+    response.raise_for_status()
+    data = response.json()
+    biblio_search = data.get("ops:world-patent-data", {}).get("ops:biblio-search", {})
+    total = int(biblio_search.get("@total-result-count", 0))
+    publications = biblio_search.get("ops:search-result", {}).get("ops:publication-reference", [])
+    if isinstance(publications, dict):
+        publications = [publications]
+    return total, publications
+
+
+def search_patents(client, keyword, start=1, batch_size=SEARCH_PAGE_SIZE, max_results=1000):
     all_results = []
     while start <= max_results:
         end = start + batch_size - 1
-        params = {
-            "q": keyword,
-            "range": f"{start}-{end}"
-        }
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            search_result = data.get("ops:world-patent-data", {}).get("ops:biblio-search", {}).get("ops:search-result", {})
-            publications = search_result.get("ops:publication-reference", [])
-            all_results.extend(publications)
-        else:
-            response.raise_for_status()
+        total, publications = search_page(client, keyword, start, end)
+        all_results.extend(publications)
+        if end >= total:
+            break
         start += batch_size
-        time.sleep(1) 
     return all_results
 
 
-def xml_to_dict(element):
-    if len(element) == 0:
-        return element.text
-    result = {}
-    for child in element:
-        child_result = xml_to_dict(child)
-        tag = child.tag.split('}', 1)[-1]
-        if tag in result:
-            if not isinstance(result[tag], list):
-                result[tag] = [result[tag]]
-            result[tag].append(child_result)
-        else:
-            result[tag] = child_result
-    return result
-
-
 def file_exists_in_any_subfolder(filename, output_paths):
     for path in output_paths:
         if os.path.exists(os.path.join(path, filename)):
@@ -74,24 +75,82 @@ def file_exists_in_any_subfolder(filename, output_paths):
     return False
 
 
-def get_patent_biblio(doc_number, token):
-    url = f"http://ops.epo.org/rest-services/published-data/publication/epodoc/{doc_number}/biblio"
+def get_patent_biblio_response(doc_number, client):
+    url = ops_url(f"/rest-services/published-data/publication/epodoc/{doc_number}/biblio")
+    headers = {
+        'Accept': 'application/exchange+xml',
+    }
+    return client.get(url, "retrieval", headers=headers)
+
+
+def get_patent_biblio_xml(doc_number, client):
+    response = get_patent_biblio_response(doc_number, client)
+
+    if response.status_code == 200:
+        return response.content
+    elif response.status_code == 404:
+        print(f"Error 404: No se encontró biblio para el documento {doc_number}")
+        return None
+    else:
+        print(f"Error en la consulta de biblio ({response.status_code}) para el documento {doc_number}")
+        return None
+
+
+def get_patent_biblio(doc_number, client):
+    content = get_patent_biblio_xml(doc_number, client)
+    if content is None:
+        return None
+    try:
+        return ET.fromstring(content)
+    except ET.ParseError as e:
+        print(f"Error al analizar el XML: {e}")
+        return None
+
+
+BULK_LIMIT = 100
+
+
+def split_bulk_biblio(root, doc_numbers):
+    requested = set(doc_numbers)
+    documents = {}
+    for exchange_documents in root:
+        if not exchange_documents.tag.endswith('exchange-documents'):
+            continue
+        for document in exchange_documents:
+            country = document.get('country', '')
+            number = document.get('doc-number', '')
+            kind = document.get('kind', '')
+            for key in (f"{country}{number}{kind}", f"{country}{number}"):
+                if key in requested:
+                    documents.setdefault(key, (exchange_documents.tag, []))[1].append(document)
+                    break
+    results = {}
+    for doc_number, (container_tag, group) in documents.items():
+        patent_root = ET.Element(root.tag)
+        container = ET.SubElement(patent_root, container_tag)
+        container.extend(group)
+        results[doc_number] = patent_root
+    return results
+
+
+def get_patent_biblio_bulk(doc_numbers, client):
+    url = ops_url("/rest-services/published-data/publication/epodoc/biblio")
     headers = {
-        'Authorization': f'Bearer {token}',
         'Accept': 'application/exchange+xml',
+        'Content-Type': 'text/plain',
     }
-    response = requests.get(url, headers=headers)
+    response = client.post(url, "retrieval", headers=headers, data="\n".join(doc_numbers))
 
     if response.status_code == 200:
         try:
-            root = ET.fromstring(response.text)
-            return root
+            root = ET.fromstring(response.content)
         except ET.ParseError as e:
             print(f"Error al analizar el XML: {e}")
             return None
+        return split_bulk_biblio(root, doc_numbers)
     elif response.status_code == 404:
-        print(f"Error 404: No se encontró biblio para el documento {doc_number}")
-        return None
+        print(f"Error 404: No se encontró biblio para ninguno de los {len(doc_numbers)} documentos")
+        return {}
     else:
-        print(f"Error en la consulta de biblio ({response.status_code}) para el documento {doc_number}")
-        return None
\ No newline at end of file
+        print(f"Error en la consulta de biblio en bloque ({response.status_code}) para {len(doc_numbers)} documentos")
+        return None
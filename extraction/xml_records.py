@@ -0,0 +1,221 @@
+import glob
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+
+
+PARTY_TAGS = {"applicant": "applicants", "inventor": "inventors"}
+# XP numbers are EPO identifiers for non-patent literature cited as patcit
+NON_PATENT_PREFIXES = ("XP",)
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def new_record(attributes):
+    return {
+        "patent_number": f"{attributes.get('country', '')}{attributes.get('doc-number', '')}",
+        "country": attributes.get("country"),
+        "doc_number": attributes.get("doc-number"),
+        "kind": attributes.get("kind"),
+        "family_id": attributes.get("family-id"),
+        "date": None,
+        "titles": [],
+        "abstracts": [],
+        "applicants": [],
+        "inventors": [],
+        "patcit": [],
+        "nplcit": [],
+    }
+
+
+def document_id(element):
+    values = {local_name(child.tag): (child.text or "").strip() for child in element}
+    return {
+        "type": element.get("document-id-type"),
+        "country": values.get("country"),
+        "doc_number": values.get("doc-number"),
+        "kind": values.get("kind"),
+        "date": values.get("date"),
+    }
+
+
+def child_text(element, path):
+    for child in element.iter():
+        if local_name(child.tag) == path:
+            return child.text or ""
+    return None
+
+
+def iter_records(source):
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    stack = []
+    record = None
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        tag = local_name(element.tag)
+        if event == "start":
+            stack.append(tag)
+            if tag == "exchange-document":
+                record = new_record(element.attrib)
+            continue
+        stack.pop()
+        if record is None:
+            continue
+        parent = stack[-1] if stack else None
+        if tag == "exchange-document":
+            yield record
+            record = None
+            element.clear()
+        elif tag == "invention-title":
+            record["titles"].append([element.get("lang"), element.text or ""])
+        elif tag == "abstract":
+            text = " ".join("".join(p.itertext()) for p in element if local_name(p.tag) == "p")
+            record["abstracts"].append([element.get("lang"), text])
+            element.clear()
+        elif tag in PARTY_TAGS and parent == PARTY_TAGS[tag]:
+            name = child_text(element, "name")
+            if name is not None:
+                record[PARTY_TAGS[tag]].append(name)
+            element.clear()
+        elif tag == "document-id" and parent == "publication-reference":
+            if record["date"] is None:
+                doc_id = document_id(element)
+                record["date"] = doc_id["date"]
+                record["country"] = record["country"] or doc_id["country"]
+                record["doc_number"] = record["doc_number"] or doc_id["doc_number"]
+        elif tag == "document-id" and parent == "patcit":
+            record["patcit"].append(document_id(element))
+        elif tag == "nplcit":
+            text = child_text(element, "text")
+            record["nplcit"].append(text if text is not None else "".join(element.itertext()).strip())
+            element.clear()
+
+
+def as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def dict_text(value):
+    if isinstance(value, list):
+        return " ".join(dict_text(item) for item in value)
+    if isinstance(value, dict):
+        return " ".join(dict_text(item) for item in value.values())
+    return value or ""
+
+
+def records_from_dict(data, patent_number):
+    records = []
+    exchange_documents = (data.get("exchange-documents") or {}).get("exchange-document")
+    for document in as_list(exchange_documents):
+        bibliographic_data = document.get("bibliographic-data") or {}
+        record = new_record({})
+        record["patent_number"] = patent_number
+        publication_reference = as_list((bibliographic_data.get("publication-reference") or {}).get("document-id"))
+        if publication_reference:
+            record["country"] = publication_reference[0].get("country")
+            record["doc_number"] = publication_reference[0].get("doc-number")
+            record["kind"] = publication_reference[0].get("kind")
+            record["date"] = publication_reference[0].get("date")
+        record["titles"] = [[None, dict_text(title)] for title in as_list(bibliographic_data.get("invention-title"))]
+        record["abstracts"] = [
+            [None, dict_text(abstract.get("p")) if isinstance(abstract, dict) else dict_text(abstract)]
+            for abstract in as_list(document.get("abstract"))
+        ]
+        parties = bibliographic_data.get("parties") or {}
+        for tag, group in PARTY_TAGS.items():
+            for party in as_list((parties.get(group) or {}).get(tag)):
+                name = (party.get(f"{tag}-name") or {}).get("name") if isinstance(party, dict) else None
+                if name is not None:
+                    record[group].append(name)
+        references = (bibliographic_data.get("references-cited") or {}).get("citation")
+        for citation in as_list(references):
+            if not isinstance(citation, dict):
+                continue
+            if isinstance(citation.get("patcit"), dict):
+                for doc_id in as_list(citation["patcit"].get("document-id")):
+                    record["patcit"].append({
+                        "type": None,
+                        "country": doc_id.get("country"),
+                        "doc_number": doc_id.get("doc-number"),
+                        "kind": doc_id.get("kind"),
+                        "date": doc_id.get("date"),
+                    })
+            if citation.get("nplcit") is not None:
+                record["nplcit"].append(dict_text(citation["nplcit"]))
+        records.append(record)
+    return records
+
+
+def records_from_json(data, patent_number):
+    # The fetcher saves the records it parsed from the XML; downloads from before that
+    # keep the OPS dict layout
+    if isinstance(data, list):
+        return [dict(record, patent_number=patent_number or record["patent_number"]) for record in data]
+    return records_from_dict(data, patent_number)
+
+
+def citation_keys(record):
+    citations = []
+    for doc_id in record["patcit"]:
+        doc_number = doc_id["doc_number"]
+        country = doc_id["country"]
+        if not doc_number:
+            continue
+        if country:
+            no_country_code_version = doc_number.replace(country, '').strip()
+            if no_country_code_version in citations:
+                citations.remove(no_country_code_version)
+            key = country + doc_number
+        else:
+            key = doc_number
+        if key.startswith(NON_PATENT_PREFIXES):
+            continue
+        if key not in citations:
+            citations.append(key)
+    return citations
+
+
+def select_text(entries, default="Unavailable information"):
+    texts = [text for _, text in entries if text]
+    for text in texts:
+        if text.isascii():
+            return text
+    return texts[0] if texts else default
+
+
+def parse_biblio(data, patent_number=None):
+    records = list(iter_records(data))
+    if patent_number:
+        for record in records:
+            record["patent_number"] = patent_number
+    return records
+
+
+def convert_archive(raw_path, output_file):
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as out:
+        for file_path in sorted(glob.glob(os.path.join(raw_path, "**", "*.xml"), recursive=True)):
+            patent_number = os.path.splitext(os.path.basename(file_path))[0]
+            topic = os.path.basename(os.path.dirname(file_path))
+            try:
+                with open(file_path, "rb") as f:
+                    for record in iter_records(f):
+                        record["patent_number"] = patent_number
+                        record["topic"] = topic
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        count += 1
+            except ET.ParseError as e:
+                print(f"Error al analizar el XML {file_path}: {e}")
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+    raw_path = sys.argv[1] if len(sys.argv) > 1 else "biblio_output/raw"
+    output_file = sys.argv[2] if len(sys.argv) > 2 else "biblio_output/records.jsonl"
+    print(f"{convert_archive(raw_path, output_file)} registros escritos en {output_file}")